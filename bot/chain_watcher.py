@@ -1,262 +1,477 @@
-# bot/chain_watcher.py
-from __future__ import annotations
-
-import asyncio
-from dataclasses import dataclass
-from typing import Optional, Set, List
-
-import discord
-
-from . import torn_api
-from . import db
-from .targets import TargetPicker
-
-
-# -------------------------------------------------------------------
-# CONFIG (change in ONE place)
-# -------------------------------------------------------------------
-
-@dataclass(frozen=True)
-class ChainAlertConfig:
-    # Who can start/stop
-    control_roles: Set[str] = frozenset({"Negan Saviors", "Lieutenant Saviors"})
-
-    # Who is eligible to be pinged
-    ping_role_name: str = "Savior"
-
-    # Target link lines
-    msg_target_line: str = "🎯 Easy target: {url}"
-    msg_target_none: str = "🎯 Easy target: *(none available right now)*"
-
-    # When to alert (seconds remaining). Live value from Torn: chain.timeout
-    alert_seconds: int = 75
-
-    # Poll interval (seconds)
-    poll_seconds: int = 15
-
-    # Message templates (edit here)
-    msg_role_missing: str = (
-        "⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
-        "⚠️ Role `{ping_role}` not found — nobody pinged."
-    )
-    msg_no_eligible: str = (
-        "⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
-        "(No **{ping_role}** members eligible to ping.)"
-    )
-    msg_alert_header: str = (
-        "⛓️ **CHAIN TIMER LOW** — **{timeout}s** left (chain `{chain_id}`)\n"
-        "Pinging **{ping_role}** members:"
-    )
-
-
-CFG = ChainAlertConfig()
-
-
-# -------------------------------------------------------------------
-# Helpers
-# -------------------------------------------------------------------
-
-def is_chain_controller(member: discord.Member) -> bool:
-    return any(r.name in CFG.control_roles for r in getattr(member, "roles", []))
-
-
-def chunk_mentions(user_ids: List[int], max_len: int = 1800) -> List[str]:
-    chunks: List[str] = []
-    cur = ""
-    for uid in user_ids:
-        mention = f"<@{uid}> "
-        if len(cur) + len(mention) > max_len:
-            if cur:
-                chunks.append(cur.strip())
-            cur = mention
-        else:
-            cur += mention
-    if cur:
-        chunks.append(cur.strip())
-    return chunks
-
-
-# -------------------------------------------------------------------
-# Watcher
-# -------------------------------------------------------------------
-
-@dataclass
-class ChainWatcherState:
-    running: bool = False
-    channel_id: Optional[int] = None
-    started_by: Optional[int] = None
-    last_chain_id: Optional[int] = None
-    alert_armed: bool = True  # re-arms when timeout > CFG.alert_seconds or chain id changes
-
-
-class ChainWatcher:
-    """
-    Polls Torn /faction/chain and pings when timeout <= CFG.alert_seconds.
-
-    Pings only members with role CFG.ping_role_name who are:
-      - opted-in via /pingme (even if offline)
-    """
-
-    def get_status_snapshot(self, guild_id: int) -> dict:
-        """
-        Returns a small, safe snapshot of watcher state for /chainstatus and /status.
-        No API calls; purely internal state + CFG values.
-        """
-        st = self._state(guild_id)
-        return {
-            "running": bool(st.running),
-            "channel_id": st.channel_id,
-            "started_by": st.started_by,
-            "last_chain_id": st.last_chain_id,
-            "alert_armed": bool(st.alert_armed),
-            "poll_seconds": int(self.poll_seconds),
-            "ping_role_name": CFG.ping_role_name,
-            "alert_seconds": int(CFG.alert_seconds),
-            "control_roles": sorted(list(CFG.control_roles)),
-        }
-
-    def __init__(self, client: discord.Client, db_conn, poll_seconds: Optional[int] = None):
-        self.client = client
-        self.db_conn = db_conn
-        self.poll_seconds = int(poll_seconds if poll_seconds is not None else CFG.poll_seconds)
-
-        self._state_by_guild: dict[int, ChainWatcherState] = {}
-        self._tasks: dict[int, asyncio.Task] = {}
-
-        # Pick “easy target” link for alerts (cached to avoid API spam)
-        self.target_picker = TargetPicker(cache_ttl_seconds=60)
-
-    def _state(self, guild_id: int) -> ChainWatcherState:
-        return self._state_by_guild.setdefault(guild_id, ChainWatcherState())
-
-    async def start(self, guild: discord.Guild, channel: discord.abc.Messageable, started_by: int) -> None:
-        st = self._state(guild.id)
-        st.running = True
-        st.channel_id = getattr(channel, "id", None)
-        st.started_by = int(started_by)
-        st.alert_armed = True
-
-        task = self._tasks.get(guild.id)
-        if task and not task.done():
-            return  # already running
-
-        self._tasks[guild.id] = asyncio.create_task(self._run_loop(guild.id))
-
-    async def stop(self, guild_id: int) -> None:
-        st = self._state(guild_id)
-        st.running = False
-
-        task = self._tasks.get(guild_id)
-        if task and not task.done():
-            task.cancel()
-            try:
-                await task
-            except asyncio.CancelledError:
-                pass
-
-    async def _run_loop(self, guild_id: int) -> None:
-        while True:
-            st = self._state(guild_id)
-            if not st.running:
-                return
-
-            try:
-                payload = await torn_api.fetch_faction_chain()
-                chain = torn_api.parse_active_chain(payload)
-
-                if not chain:
-                    st.last_chain_id = None
-                    st.alert_armed = True
-                    await asyncio.sleep(self.poll_seconds)
-                    continue
-
-                chain_id = int(chain["id"])
-                timeout = int(chain.get("timeout") or 0)
-
-                # New chain => re-arm
-                if st.last_chain_id != chain_id:
-                    st.last_chain_id = chain_id
-                    st.alert_armed = True
-
-                # New hit resets timer => when it goes back above threshold, re-arm for next drop
-                if timeout > CFG.alert_seconds:
-                    st.alert_armed = True
-
-                # Fire once per "danger window"
-                if timeout <= CFG.alert_seconds and st.alert_armed:
-                    st.alert_armed = False
-                    await self._send_alert(guild_id, chain_id, timeout)
-
-            except asyncio.CancelledError:
-                raise
-            except Exception as e:
-                print("[chain] watcher error:", repr(e))
-
-            await asyncio.sleep(self.poll_seconds)
-
-    async def _send_alert(self, guild_id: int, chain_id: int, timeout: int) -> None:
-        guild = self.client.get_guild(guild_id)
-        if not guild:
-            return
-
-        st = self._state(guild_id)
-        channel = guild.get_channel(st.channel_id) if st.channel_id else None
-        if channel is None:
-            return
-
-        ping_role = discord.utils.get(guild.roles, name=CFG.ping_role_name)
-        if not ping_role:
-            await channel.send(
-                CFG.msg_role_missing.format(
-                    timeout=timeout, chain_id=chain_id, ping_role=CFG.ping_role_name
-                )
-            )
-            return
-
-        opted_in_ids = set(db.chain_optin_list(self.db_conn, guild_id))
-
-        ping_ids: Set[int] = set()
-        for member in guild.members:
-            if member.bot:
-                continue
-
-            # Opt-in ONLY
-            if member.id not in opted_in_ids:
-                continue
-
-            # Still require the ping role (prevents pinging ex-members / role removals)
-            if ping_role not in member.roles:
-                continue
-
-            ping_ids.add(member.id)
-
-
-        if not ping_ids:
-            await channel.send(
-                CFG.msg_no_eligible.format(
-                    timeout=timeout, chain_id=chain_id, ping_role=CFG.ping_role_name
-                )
-            )
-            return
-
-        # Pick first available target (in configured order)
-        target = await self.target_picker.pick_first_available()
-        if target:
-            target_line = CFG.msg_target_line.format(url=target.url)
-        else:
-            err = getattr(self.target_picker, "last_error", None)
-            if err:
-                target_line = CFG.msg_target_none + f"\nℹ️ debug: `{err}`"
-            else:
-                target_line = CFG.msg_target_none
-
-        await channel.send(
-            CFG.msg_alert_header.format(
-                timeout=timeout, chain_id=chain_id, ping_role=CFG.ping_role_name
-            )
-            + "\n"
-            + target_line
-        )
-
-        for chunk in chunk_mentions(sorted(ping_ids)):
-            await channel.send(chunk)
+# bot/chain_watcher.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Optional, Set, List
+
+import discord
+
+from . import torn_api
+from . import db
+from .ratelimit import pacer
+from .targets import TargetPicker
+
+log = logging.getLogger(__name__)
+
+
+# -------------------------------------------------------------------
+# CONFIG (change in ONE place)
+# -------------------------------------------------------------------
+
+@dataclass(frozen=True, slots=True)
+class ChainAlertConfig:
+    # Who can start/stop
+    control_roles: Set[str] = frozenset({"Negan Saviors", "Lieutenant Saviors"})
+
+    # Who is eligible to be pinged
+    ping_role_name: str = "Savior"
+
+    # Target link lines
+    msg_target_line: str = "🎯 Easy target: {url}"
+    msg_target_none: str = "🎯 Easy target: *(none available right now)*"
+
+    # When to alert (seconds remaining). Live value from Torn: chain.timeout
+    alert_seconds: int = 75
+
+    # Poll interval (seconds)
+    poll_seconds: int = 15
+
+    # Message templates. NOTE: _send_alert inlines these as f-strings for
+    # speed — if you edit the wording here, mirror it there.
+    msg_role_missing: str = (
+        "⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
+        "⚠️ Role `{ping_role}` not found — nobody pinged."
+    )
+    msg_no_eligible: str = (
+        "⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
+        "(No **{ping_role}** members eligible to ping.)"
+    )
+    msg_alert_header: str = (
+        "⛓️ **CHAIN TIMER LOW** — **{timeout}s** left (chain `{chain_id}`)\n"
+        "Pinging **{ping_role}** members:"
+    )
+
+
+CFG = ChainAlertConfig()
+
+
+# -------------------------------------------------------------------
+# Helpers
+# -------------------------------------------------------------------
+
+def is_chain_controller(member: discord.Member, control_role_ids: Optional[frozenset] = None) -> bool:
+    if control_role_ids is not None:
+        # Fast path: raw role-id list against precomputed id set
+        # (member.roles allocates a fresh list on every access)
+        raw = getattr(member, "_roles", None)
+        if raw is not None:
+            return any(rid in control_role_ids for rid in raw)
+        return any(r.id in control_role_ids for r in getattr(member, "roles", []))
+    return any(r.name in CFG.control_roles for r in getattr(member, "roles", []))
+
+
+def chunk_mentions(user_ids: List[int], max_len: int = 1800) -> List[str]:
+    # Collect fragments and join once per chunk (repeated str += is quadratic)
+    chunks: List[str] = []
+    buf: List[str] = []
+    buf_len = 0
+    for uid in user_ids:
+        mention = f"<@{uid}> "
+        if buf and buf_len + len(mention) > max_len:
+            chunks.append("".join(buf).rstrip())
+            buf = []
+            buf_len = 0
+        buf.append(mention)
+        buf_len += len(mention)
+    if buf:
+        chunks.append("".join(buf).rstrip())
+    return chunks
+
+
+async def _interruptible_sleep(delay: float, stop_event: asyncio.Event) -> bool:
+    """
+    Sleep up to `delay` seconds, waking immediately if `stop_event` is set.
+    Returns True when interrupted by the event, False on a full sleep.
+    """
+    try:
+        await asyncio.wait_for(stop_event.wait(), timeout=delay)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+# -------------------------------------------------------------------
+# Watcher
+# -------------------------------------------------------------------
+
+@dataclass(slots=True)
+class ChainWatcherState:
+    running: bool = False
+    channel_id: Optional[int] = None
+    started_by: Optional[int] = None
+    last_chain_id: Optional[int] = None
+    alert_armed: bool = True  # re-arms when timeout > CFG.alert_seconds or chain id changes
+
+    # Live references captured at start() so alerts skip cache lookups
+    guild: Optional[discord.Guild] = None
+    channel: Optional[discord.abc.Messageable] = None
+
+
+class ChainWatcher:
+    """
+    Polls Torn /faction/chain and pings when timeout <= CFG.alert_seconds.
+
+    Pings only members with role CFG.ping_role_name who are:
+      - opted-in via /pingme (even if offline)
+    """
+
+    def get_status_snapshot(self, guild_id: int) -> dict:
+        """
+        Returns a small, safe snapshot of watcher state for /chainstatus and /status.
+        No API calls; purely internal state + CFG values.
+        """
+        st = self._state(guild_id)
+        return {
+            "running": bool(st.running),
+            "channel_id": st.channel_id,
+            "started_by": st.started_by,
+            "last_chain_id": st.last_chain_id,
+            "alert_armed": bool(st.alert_armed),
+            "poll_seconds": int(self.poll_seconds),
+            "ping_role_name": CFG.ping_role_name,
+            "alert_seconds": int(CFG.alert_seconds),
+            "control_roles": sorted(list(CFG.control_roles)),
+        }
+
+    def __init__(self, client: discord.Client, db_conn, poll_seconds: Optional[int] = None):
+        self.client = client
+        self.db_conn = db_conn
+        self.poll_seconds = int(poll_seconds if poll_seconds is not None else CFG.poll_seconds)
+
+        self._state_by_guild: dict[int, ChainWatcherState] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+        self._stop_events: dict[int, asyncio.Event] = {}
+        self._err_delay: int = 0  # exponential backoff after watcher errors
+
+        # Ping role cache (primed lazily in _send_alert, kept fresh via gateway events)
+        self._role_id: Optional[int] = None
+        self._role_member_ids: Set[int] = set()
+
+        # Control-role ids per guild (for permission checks without name compares)
+        self._control_role_ids: dict[int, frozenset] = {}
+
+        # name -> Role per guild; guild.roles is a linear scan via discord.utils.get
+        self._role_by_name: dict[int, dict[str, discord.Role]] = {}
+
+        client.event(self.on_member_update)
+        client.event(self.on_guild_role_create)
+        client.event(self.on_guild_role_update)
+        client.event(self.on_guild_role_delete)
+
+        # Pick “easy target” link for alerts (cached to avoid API spam)
+        self.target_picker = TargetPicker(cache_ttl_seconds=60)
+
+        # Keeps multi-chunk sends below Discord's per-channel rate limit
+        self.pacer = pacer  # process-wide per-channel bucket
+
+        # Shared chain payload cache: the watcher writes through it and
+        # /chain status reads from it instead of hitting Torn again.
+        self._chain_cache: Optional[tuple[float, dict]] = None
+        self._chain_inflight: Optional[asyncio.Task] = None
+
+        # Opt-in cache per guild; DB stays the source of truth across restarts,
+        # but alerts and /chain list read from here (write-through on changes).
+        self._optins: dict[int, Set[int]] = {}
+
+    def _state(self, guild_id: int) -> ChainWatcherState:
+        return self._state_by_guild.setdefault(guild_id, ChainWatcherState())
+
+    # ---------------------------------------------------------------
+    # Opt-in cache (write-through to DB)
+    # ---------------------------------------------------------------
+
+    async def optins_get(self, guild_id: int) -> Set[int]:
+        s = self._optins.get(guild_id)
+        if s is None:
+            s = set(await asyncio.to_thread(db.chain_optin_list, self.db_conn, guild_id))
+            self._optins[guild_id] = s
+        return s
+
+    async def optin_add(self, guild_id: int, user_id: int) -> None:
+        await asyncio.to_thread(db.chain_optin_add, self.db_conn, guild_id, user_id)
+        (await self.optins_get(guild_id)).add(int(user_id))
+
+    async def optin_remove(self, guild_id: int, user_id: int) -> None:
+        await asyncio.to_thread(db.chain_optin_remove, self.db_conn, guild_id, user_id)
+        (await self.optins_get(guild_id)).discard(int(user_id))
+
+    async def optin_clear(self, guild_id: int) -> int:
+        cleared = await asyncio.to_thread(db.chain_optin_clear_guild, self.db_conn, guild_id)
+        self._optins.pop(guild_id, None)
+        return cleared
+
+    # ---------------------------------------------------------------
+    # Ping role cache
+    # ---------------------------------------------------------------
+
+    def _resolve_ping_role(self, guild: discord.Guild) -> Optional[discord.Role]:
+        """
+        Returns the ping role, using the cached role id when possible.
+        Primes the cached member-id set on first resolution (or re-primes
+        if the cached role disappeared / was renamed).
+        """
+        if self._role_id is not None:
+            role = guild.get_role(self._role_id)
+            if role is not None and role.name == CFG.ping_role_name:
+                return role
+            # Cached role gone or renamed — drop and re-resolve below
+            self._role_id = None
+            self._role_member_ids = set()
+
+        role = self._roles_by_name_for(guild).get(CFG.ping_role_name)
+        if role is not None:
+            self._role_id = role.id
+            self._role_member_ids = {m.id for m in role.members if not m.bot}
+        return role
+
+    def _roles_by_name_for(self, guild: discord.Guild) -> dict[str, discord.Role]:
+        idx = self._role_by_name.get(guild.id)
+        if idx is None:
+            idx = {r.name: r for r in guild.roles}
+            self._role_by_name[guild.id] = idx
+        return idx
+
+    def control_role_ids_for(self, guild: discord.Guild) -> frozenset:
+        ids = self._control_role_ids.get(guild.id)
+        if ids is None:
+            ids = frozenset(r.id for r in guild.roles if r.name in CFG.control_roles)
+            self._control_role_ids[guild.id] = ids
+        return ids
+
+    async def on_member_update(self, before: discord.Member, after: discord.Member) -> None:
+        if self._role_id is None or after.bot:
+            return
+        had = any(r.id == self._role_id for r in before.roles)
+        has = any(r.id == self._role_id for r in after.roles)
+        if has and not had:
+            self._role_member_ids.add(after.id)
+        elif had and not has:
+            self._role_member_ids.discard(after.id)
+
+    async def on_guild_role_create(self, role: discord.Role) -> None:
+        self._role_by_name.pop(role.guild.id, None)
+        if role.name in CFG.control_roles:
+            self._control_role_ids.pop(role.guild.id, None)
+
+    async def on_guild_role_update(self, before: discord.Role, after: discord.Role) -> None:
+        self._role_by_name.pop(after.guild.id, None)
+        # Rename of (or onto) the ping role invalidates the cache
+        if after.id == self._role_id or after.name == CFG.ping_role_name:
+            self._role_id = None
+            self._role_member_ids = set()
+        # Same for the control roles (name changed either way)
+        if before.name in CFG.control_roles or after.name in CFG.control_roles:
+            self._control_role_ids.pop(after.guild.id, None)
+
+    async def on_guild_role_delete(self, role: discord.Role) -> None:
+        self._role_by_name.pop(role.guild.id, None)
+        if role.id == self._role_id:
+            self._role_id = None
+            self._role_member_ids = set()
+        if role.name in CFG.control_roles:
+            self._control_role_ids.pop(role.guild.id, None)
+
+    async def start(self, guild: discord.Guild, channel: discord.abc.Messageable, started_by: int) -> None:
+        st = self._state(guild.id)
+        await self.optins_get(guild.id)  # prime the opt-in cache
+        st.running = True
+        st.channel_id = getattr(channel, "id", None)
+        st.started_by = int(started_by)
+        st.alert_armed = True
+        st.guild = guild
+        st.channel = channel
+
+        task = self._tasks.get(guild.id)
+        if task and not task.done():
+            return  # already running
+
+        self._stop_events[guild.id] = asyncio.Event()
+        self._tasks[guild.id] = asyncio.create_task(self._run_loop(guild.id))
+
+    async def stop(self, guild_id: int) -> None:
+        st = self._state(guild_id)
+        st.running = False
+
+        # Wake the loop immediately instead of waiting out the poll sleep
+        evt = self._stop_events.get(guild_id)
+        if evt is not None:
+            evt.set()
+
+        task = self._tasks.get(guild_id)
+        if task and not task.done():
+            try:
+                await asyncio.wait_for(task, timeout=5)
+            except asyncio.TimeoutError:
+                # Loop stuck mid-request — cancel as a last resort
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+
+    async def _fetch_chain_through_cache(self) -> dict:
+        payload = await torn_api.fetch_faction_chain()
+        self._chain_cache = (time.monotonic(), payload)
+        return payload
+
+    async def get_chain_cached(self, max_age: Optional[float] = None) -> dict:
+        """
+        Returns the /faction/chain payload, served from cache when younger
+        than max_age (default poll_seconds/2). Concurrent callers share a
+        single in-flight fetch instead of each hitting the Torn API.
+        """
+        if max_age is None:
+            max_age = max(1.0, self.poll_seconds / 2)
+
+        cached = self._chain_cache
+        if cached is not None and (time.monotonic() - cached[0]) <= max_age:
+            return cached[1]
+
+        if self._chain_inflight is None or self._chain_inflight.done():
+            self._chain_inflight = asyncio.create_task(self._fetch_chain_through_cache())
+        return await asyncio.shield(self._chain_inflight)
+
+    def _next_delay(self, chain: Optional[dict], timeout: int) -> float:
+        """
+        Adaptive poll delay: back off when there's nothing to watch, tighten up
+        as the chain timer approaches the alert threshold so we don't miss the
+        edge by up to a full poll interval. Floor of 2s to avoid tight loops.
+        """
+        if not chain:
+            return float(self.poll_seconds * 4)
+        return float(max(2, min(self.poll_seconds, timeout - CFG.alert_seconds - 2)))
+
+    async def _run_loop(self, guild_id: int) -> None:
+        stop_event = self._stop_events.setdefault(guild_id, asyncio.Event())
+
+        # Hoisted out of the loop: state entries are never removed from
+        # _state_by_guild, and these config values are fixed for the run.
+        st = self._state(guild_id)
+        poll_seconds = float(self.poll_seconds)
+        alert_seconds = CFG.alert_seconds
+
+        while True:
+            if not st.running or stop_event.is_set():
+                return
+
+            delay = poll_seconds
+
+            try:
+                # max_age=0 forces a fresh poll but still writes through the
+                # shared cache (and coalesces with any in-flight status fetch)
+                payload = await self.get_chain_cached(max_age=0.0)
+                chain = torn_api.parse_active_chain(payload)
+                self._err_delay = 0
+
+                if not chain:
+                    st.last_chain_id = None
+                    st.alert_armed = True
+                    if await _interruptible_sleep(self._next_delay(None, 0), stop_event):
+                        return
+                    continue
+
+                chain_id = int(chain["id"])
+                timeout = int(chain.get("timeout") or 0)
+
+                # New chain => re-arm
+                if st.last_chain_id != chain_id:
+                    st.last_chain_id = chain_id
+                    st.alert_armed = True
+
+                # New hit resets timer => when it goes back above threshold, re-arm for next drop
+                if timeout > alert_seconds:
+                    st.alert_armed = True
+
+                # Fire once per "danger window"
+                if timeout <= alert_seconds and st.alert_armed:
+                    st.alert_armed = False
+                    await self._send_alert(guild_id, chain_id, timeout)
+
+                delay = self._next_delay(chain, timeout)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("chain watcher error")
+                self._err_delay = min(60, (self._err_delay or 1) * 2)
+                delay = float(self._err_delay)
+
+            if await _interruptible_sleep(delay, stop_event):
+                return
+
+    async def _send_alert(self, guild_id: int, chain_id: int, timeout: int) -> None:
+        st = self._state(guild_id)
+
+        guild = st.guild or self.client.get_guild(guild_id)
+        if not guild:
+            return
+
+        channel = st.channel
+        if channel is None:
+            channel = guild.get_channel(st.channel_id) if st.channel_id else None
+        if channel is None:
+            return
+
+        opted_in_ids = await self.optins_get(guild_id)
+
+        # Nobody opted in => nothing to ping, don't even resolve the role
+        if not opted_in_ids:
+            await channel.send(
+                f"⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
+                f"(No **{CFG.ping_role_name}** members eligible to ping.)"
+            )
+            return
+
+        ping_role = self._resolve_ping_role(guild)
+        if not ping_role:
+            await channel.send(
+                f"⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
+                f"⚠️ Role `{CFG.ping_role_name}` not found — nobody pinged."
+            )
+            return
+
+        # Opt-in ONLY, and still require the ping role
+        # (prevents pinging ex-members / role removals)
+        ping_ids: Set[int] = opted_in_ids & self._role_member_ids
+
+        if not ping_ids:
+            await channel.send(
+                f"⛓️ Chain low: **{timeout}s** left (chain `{chain_id}`)\n"
+                f"(No **{CFG.ping_role_name}** members eligible to ping.)"
+            )
+            return
+
+        # Pick first available target (in configured order)
+        target = await self.target_picker.pick_first_available()
+        if target:
+            target_line = f"🎯 Easy target: {target.url}"
+        else:
+            err = getattr(self.target_picker, "last_error", None)
+            if err:
+                target_line = CFG.msg_target_none + f"\nℹ️ debug: `{err}`"
+            else:
+                target_line = CFG.msg_target_none
+
+        await self.pacer.acquire(channel.id)
+        await channel.send(
+            f"⛓️ **CHAIN TIMER LOW** — **{timeout}s** left (chain `{chain_id}`)\n"
+            f"Pinging **{CFG.ping_role_name}** members:"
+            "\n" + target_line
+        )
+
+        for chunk in chunk_mentions(sorted(ping_ids)):
+            await self.pacer.acquire(channel.id)
+            await channel.send(chunk)
@@ -1,35 +1,53 @@
-from typing import List
-import discord
-from discord import app_commands
-
-from ..utils import chunk_lines
-
-
-def register(tree: app_commands.CommandTree):
-    def _command_help_lines() -> List[str]:
-        cmds = list(tree.get_commands())
-        cmds.sort(key=lambda c: (c.name or "").lower())
-
-        lines: List[str] = []
-        for c in cmds:
-            name = f"/{c.name}"
-            desc = (c.description or "").strip() or "No description."
-            lines.append(f"- **{name}** — {desc}")
-        return lines
-
-    @tree.command(name="help", description="Show available bot commands.")
-    async def help_cmd(interaction: discord.Interaction):
-        await interaction.response.defer(thinking=True, ephemeral=True)
-        try:
-            lines = _command_help_lines()
-            if not lines:
-                await interaction.followup.send("No commands found.")
-                return
-
-            header = "📜 **Available commands:**\n"
-            for msg in chunk_lines(header, lines):
-                await interaction.followup.send(msg)
-
-        except Exception as e:
-            await interaction.followup.send("⚠️ Error while building help list.")
-            print("Error in /help:", repr(e))
+import logging
+from typing import List, Optional
+
+import discord
+from discord import app_commands
+
+from ..utils import send_list
+
+logger = logging.getLogger(__name__)
+
+
+# The command tree is static after startup, so build the help list once
+# and reuse it for every /help call.
+_cached_lines: Optional[List[str]] = None
+
+
+def invalidate_help_cache() -> None:
+    """Call after re-syncing the tree if commands ever change at runtime."""
+    global _cached_lines
+    _cached_lines = None
+
+
+def register(client: discord.Client, tree: app_commands.CommandTree):
+    def _command_help_lines() -> List[str]:
+        global _cached_lines
+        if _cached_lines is not None:
+            return _cached_lines
+
+        cmds = list(tree.get_commands())
+        cmds.sort(key=lambda c: (c.name or "").lower())
+
+        lines: List[str] = []
+        for c in cmds:
+            name = f"/{c.name}"
+            desc = (c.description or "").strip() or "No description."
+            lines.append(f"- **{name}** — {desc}")
+        _cached_lines = lines
+        return lines
+
+    @tree.command(name="help", description="Show available bot commands.")
+    async def help_cmd(interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True, ephemeral=True)
+        try:
+            lines = _command_help_lines()
+            if not lines:
+                await interaction.followup.send("No commands found.")
+                return
+
+            await send_list(interaction, "📜 Available commands", lines)
+
+        except Exception as e:
+            await interaction.followup.send("⚠️ Error while building help list.")
+            logger.exception("/help failed")
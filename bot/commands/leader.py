@@ -1,103 +1,117 @@
-from typing import List
-import time
-
-import discord
-from discord import app_commands
-
-from ..presence import get_active_leaders
-from ..utils import chunk_lines
-
-
-LEADERPING_COOLDOWN_SECONDS = 120  # change to taste
-_last_leaderping_by_guild: dict[int, int] = {}
-
-
-def _check_leaderping_cooldown(guild_id: int) -> int:
-    """
-    Returns remaining cooldown seconds (0 if not on cooldown) and updates timestamp if allowed.
-    """
-    now = int(time.time())
-    last = int(_last_leaderping_by_guild.get(int(guild_id), 0))
-    remaining = (last + int(LEADERPING_COOLDOWN_SECONDS)) - now
-    if remaining > 0:
-        return int(remaining)
-    _last_leaderping_by_guild[int(guild_id)] = now
-    return 0
-
-
-def register(client: discord.Client, tree: app_commands.CommandTree):
-    @tree.command(name="leader", description="Show leadership currently active on Discord (online/idle only).")
-    async def leader(interaction: discord.Interaction):
-        await interaction.response.defer(thinking=True)
-        try:
-            if not interaction.guild:
-                await interaction.followup.send("This command can only be used in the server.")
-                return
-
-            leaders = await get_active_leaders(interaction.guild)
-            if not leaders:
-                await interaction.followup.send("No leadership are currently **active** on Discord (online/idle).")
-                return
-
-            lines = [
-                f"- {m.mention} — {', '.join(matched)} (`{str(status)}`)"
-                for (m, matched, status) in leaders
-            ]
-
-            for msg in chunk_lines("**Active leadership (online/idle):**\n", lines):
-                await interaction.followup.send(msg)
-
-        except Exception as e:
-            await interaction.followup.send("⚠️ Error while running `/leader`.")
-            print("Error in /leader:", repr(e))
-
-    @tree.command(name="leaderping", description="Ping leadership currently active on Discord (online/idle only).")
-    async def leaderping(interaction: discord.Interaction):
-        await interaction.response.defer(thinking=True)
-        try:
-            if not interaction.guild:
-                await interaction.followup.send("This command can only be used in the server.")
-                return
-
-            # Cooldown (per guild)
-            remaining = _check_leaderping_cooldown(interaction.guild.id)
-            if remaining > 0:
-                await interaction.followup.send(
-                    f"⏳ /leaderping is on cooldown. Try again in **{remaining}s**."
-                )
-                return
-
-            leaders = await get_active_leaders(interaction.guild)
-            if not leaders:
-                await interaction.followup.send("No leadership are currently **active** on Discord (online/idle).")
-                return
-
-            mentions = [m.mention for (m, _matched, _status) in leaders]
-
-            header = "🔔 **Leadership ping (active now):**\n"
-            ping_msgs: List[str] = []
-            current = header
-
-            for mention in mentions:
-                add = mention + " "
-                if len(current) + len(add) > 1900:
-                    ping_msgs.append(current.rstrip())
-                    current = ""
-                current += add
-
-            if current.strip():
-                ping_msgs.append(current.rstrip())
-
-            for msg in ping_msgs:
-                await interaction.followup.send(msg)
-
-            lines = [
-                f"- {m.mention} — {', '.join(matched)} (`{str(status)}`)"
-                for (m, matched, status) in leaders
-            ]
-            for msg in chunk_lines("**Active leadership list:**\n", lines):
-                await interaction.followup.send(msg)
-
-        except Exception as e:
-            await interaction.followup.send("⚠️ Error while running `/leaderping`.")
-            print("Error in /leaderping:", repr(e))
+import logging
+import time
+from collections import OrderedDict
+from typing import List
+
+import discord
+from discord import app_commands
+
+from ..presence import get_active_leaders
+from ..ratelimit import send_chunked
+from ..utils import send_list
+
+logger = logging.getLogger(__name__)
+
+
+LEADERPING_COOLDOWN_SECONDS = 120  # change to taste
+
+# Bounded LRU so a multi-guild deployment can't grow this forever.
+_LEADERPING_MAX_GUILDS = 4096
+_last_leaderping_by_guild: OrderedDict[int, int] = OrderedDict()
+
+
+def _check_leaderping_cooldown(guild_id: int) -> int:
+    """
+    Returns remaining cooldown seconds (0 if not on cooldown) and updates timestamp if allowed.
+    """
+    now = int(time.time())
+    remaining = (_last_leaderping_by_guild.get(guild_id, 0) + LEADERPING_COOLDOWN_SECONDS) - now
+    if remaining > 0:
+        return remaining
+    _last_leaderping_by_guild[guild_id] = now
+    _last_leaderping_by_guild.move_to_end(guild_id)
+    if len(_last_leaderping_by_guild) > _LEADERPING_MAX_GUILDS:
+        _last_leaderping_by_guild.popitem(last=False)
+    return 0
+
+
+def register(client: discord.Client, tree: app_commands.CommandTree):
+    @tree.command(name="leader", description="Show leadership currently active on Discord (online/idle only).")
+    async def leader(interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True)
+        try:
+            if not interaction.guild:
+                await interaction.followup.send("This command can only be used in the server.")
+                return
+
+            leaders = await get_active_leaders(interaction.guild)
+            if not leaders:
+                await interaction.followup.send("No leadership are currently **active** on Discord (online/idle).")
+                return
+
+            lines = [
+                f"- {m.mention} — {', '.join(matched)} (`{str(status)}`)"
+                for (m, matched, status) in leaders
+            ]
+
+            await send_list(interaction, "Active leadership (online/idle)", lines)
+
+        except Exception as e:
+            await interaction.followup.send("⚠️ Error while running `/leader`.")
+            logger.exception("/leader failed")
+
+    @tree.command(name="leaderping", description="Ping leadership currently active on Discord (online/idle only).")
+    async def leaderping(interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True)
+        try:
+            if not interaction.guild:
+                await interaction.followup.send("This command can only be used in the server.")
+                return
+
+            # Cooldown (per guild)
+            remaining = _check_leaderping_cooldown(interaction.guild.id)
+            if remaining > 0:
+                await interaction.followup.send(
+                    f"⏳ /leaderping is on cooldown. Try again in **{remaining}s**."
+                )
+                return
+
+            leaders = await get_active_leaders(interaction.guild)
+            if not leaders:
+                await interaction.followup.send("No leadership are currently **active** on Discord (online/idle).")
+                return
+
+            mentions = [m.mention for (m, _matched, _status) in leaders]
+
+            # list buffer + running length, joined per chunk — linear instead
+            # of the O(n²) `current += add` string growth
+            header = "🔔 **Leadership ping (active now):**\n"
+            ping_msgs: List[str] = []
+            buf: List[str] = [header]
+            size = len(header)
+
+            for mention in mentions:
+                add = mention + " "
+                if size + len(add) > 1900 and len(buf) > 1:
+                    ping_msgs.append("".join(buf).rstrip())
+                    buf = []
+                    size = 0
+                buf.append(add)
+                size += len(add)
+
+            if buf and "".join(buf).strip():
+                ping_msgs.append("".join(buf).rstrip())
+
+            # Paced sends — a big mention blast would otherwise burst into
+            # the 5/5s channel bucket and stall mid-stream
+            await send_chunked(interaction, ping_msgs)
+
+            lines = [
+                f"- {m.mention} — {', '.join(matched)} (`{str(status)}`)"
+                for (m, matched, status) in leaders
+            ]
+            await send_list(interaction, "Active leadership list", lines)
+
+        except Exception as e:
+            await interaction.followup.send("⚠️ Error while running `/leaderping`.")
+            logger.exception("/leaderping failed")
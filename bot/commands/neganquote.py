@@ -3,7 +3,7 @@ import discord
 from discord import app_commands
 
 
-QUOTES = [
+QUOTES = (
     "Hi. You're Rick, right? I'm Negan. And I do not appreciate you killing my men.",
     "I'm gonna kill you. That's what I'm gonna do. I'm gonna kill you, and then I'm gonna kill your friends, and I'm gonna kill everyone you've ever met!",
     "Eeny, meeny, miny, moe.",
@@ -22,11 +22,14 @@ QUOTES = [
     "You Are Adorable! Did You Pick That Gun Because It Looks Cool? You Totally Did!",
     "I Could Never Do This With Rick. He Would Just Be Standing There, Scowling, Giving Me That Annoying Side-Eye He Gives Me.",
 
-]
+)
 
+# Dedicated RNG instance — skips the lock on the module-global random state
+_RNG = random.Random()
 
-def register(tree: app_commands.CommandTree):
+
+def register(client: discord.Client, tree: app_commands.CommandTree):
     @tree.command(name="neganquote", description="Get a random Negan-ish quote.")
     async def neganquote(interaction: discord.Interaction):
-        quote = random.choice(QUOTES)
+        quote = _RNG.choice(QUOTES)
         await interaction.response.send_message(f"**Negan says:** {quote}")
@@ -40,18 +40,16 @@ def register(client: discord.Client, tree: app_commands.CommandTree):
             members = []
 
 
-        status_by_name = {}
-        rel_by_name = {}
+        # One normalized-name map with (status, relative) tuples — each member
+        # name and each signup name gets normalized exactly once
+        info_by_name: dict[str, tuple] = {}
         for m in members:
-            name = m.get("name")
             la = (m.get("last_action") or {})
-            status_by_name[_norm(name)] = la.get("status")
-            rel_by_name[_norm(name)] = la.get("relative")
+            info_by_name[_norm(m.get("name"))] = (la.get("status"), la.get("relative"))
 
         lines = []
         for slot, name in expected:
-            st = status_by_name.get(_norm(name))
-            rel = rel_by_name.get(_norm(name))
+            st, rel = info_by_name.get(_norm(name), (None, None))
             if st is None:
                 lines.append(f"- **#{slot}** {name} — ❓ not found in faction list")
             else:
@@ -79,22 +77,22 @@ def register(client: discord.Client, tree: app_commands.CommandTree):
             start = now - timedelta(days=int(days))
             day_from = start.strftime("%Y-%m-%d")
 
-        rows = db.roster_report(client.db_conn, interaction.guild.id, day_from=day_from)
+        rows = db.roster_report(client.db_conn, interaction.guild.id, day_from=day_from, limit=60)
 
         if not rows:
             return await interaction.followup.send("✅ No missed/late roster entries recorded yet.")
 
-        lines = []
-        for r in rows[:60]:
+        def _report_line(r) -> str:
             late = int(r["late"])
             missed = int(r["missed"])
-            late_m = int(r["late_minutes"])
             extra = []
             if missed:
                 extra.append(f"missed **{missed}**")
             if late:
-                extra.append(f"late **{late}** (total **{late_m}m**)")
-            lines.append(f"- **{r['name']}** — " + ", ".join(extra))
+                extra.append(f"late **{late}** (total **{int(r['late_minutes'])}m**)")
+            return f"- **{r['name']}** — " + ", ".join(extra)
+
+        lines = [_report_line(r) for r in rows]
 
         await interaction.followup.send("📋 **Roster report (late/missed):**\n" + "\n".join(lines))
 
@@ -1,3 +1,4 @@
+import asyncio
 from datetime import datetime, timezone
 import discord
 from discord import app_commands
@@ -26,23 +27,27 @@ def register(client: discord.Client, tree: app_commands.CommandTree):
 
         snap = client.chain_watcher.get_status_snapshot(interaction.guild.id)
 
-        chain_desc = "No data"
-        try:
-            payload = await torn_api.fetch_faction_chain()
+        # Both reads are independent network calls — run them concurrently
+        # so wall time is the slower of the two, not the sum
+        payload, war_start = await asyncio.gather(
+            torn_api.fetch_faction_chain(),
+            torn_api.get_cached_ranked_war_start(),
+            return_exceptions=True,
+        )
+
+        if isinstance(payload, BaseException):
+            chain_desc = f"⚠️ chain read error ({type(payload).__name__})"
+        else:
             chain = torn_api.parse_active_chain(payload)
             if not chain:
                 chain_desc = "No active chain"
             else:
                 chain_desc = f"Active (id `{chain.get('id')}`, timeout **{chain.get('timeout')}s**)"
-        except Exception as e:
-            chain_desc = f"⚠️ chain read error ({type(e).__name__})"
 
-        war_desc = "No data"
-        try:
-            war_start = await torn_api.get_cached_ranked_war_start()
-            war_desc = f"Ranked war start: **{fmt_ts(war_start)}**"
-        except Exception:
+        if isinstance(war_start, BaseException):
             war_desc = "Ranked war start: (not found / no active ranked war?)"
+        else:
+            war_desc = f"Ranked war start: **{fmt_ts(war_start)}**"
 
         msg = (
             "⛓️ **Chain**\n"
@@ -1,17 +1,71 @@
+import logging
+
 import discord
 from discord import app_commands
 
 from ..utils import (
-    is_verified_member,
-    is_leadership_member,
-    get_torn_id_from_member,
-    chunk_lines,
+    classify_member,
+    requires_verified_torn_id,
 )
+from ..ratelimit import pacer
 from ..torn_api import get_user_warstats, get_all_warstats
 
+logger = logging.getLogger(__name__)
+
 
 def _fmt_ff(v) -> str:
-    return f"{v:.2f}" if v is not None else "n/a"
+    # "%.2f" runs the C-level formatter directly — measurably cheaper
+    # than an f-string when called three times per roster row
+    return "n/a" if v is None else "%.2f" % v
+
+
+# Embed packing limits for /warstats_all. Discord caps: 25 fields per
+# embed, at most 10 embeds per message, and 6000 chars for the COMBINED
+# text of all embeds in one message — so the char budget is enforced
+# per message, not per embed (kept under the cap for slack).
+_FIELDS_PER_EMBED = 25
+_MESSAGE_CHAR_BUDGET = 5800
+_EMBEDS_PER_MESSAGE = 10
+
+
+def _build_embeds(rows) -> list:
+    """
+    Pack one inline field per member into as few embeds as possible.
+
+    Inline fields flow three across, so Discord handles the column
+    layout — no monospace padding or code-block chunking on our side.
+    """
+    fmt_ff = _fmt_ff
+    # Format every field in one comprehension pass, then pack — the
+    # packing loop below only has to budget, not build strings
+    fields = [
+        (
+            f"{i}. " + (r.get("name") or f"[{r.get('torn_id')}]").strip(),
+            f"RW **{int(r.get('ranked_wins') or 0):,}** · "
+            f"OUT **{int(r.get('other_wins') or 0):,}**\n"
+            f"FF {fmt_ff(r.get('ranked_ff_avg'))} / "
+            f"{fmt_ff(r.get('other_ff_avg'))} / "
+            f"{fmt_ff(r.get('total_ff_avg'))}",
+        )
+        for i, r in enumerate(rows, start=1)
+    ]
+
+    embeds = []
+    embed = discord.Embed(title="📊 War Stats — All Members")
+    chars = len(embed.title)
+
+    for name, value in fields:
+        add = len(name) + len(value)
+        if len(embed.fields) >= _FIELDS_PER_EMBED or chars + add > _MESSAGE_CHAR_BUDGET:
+            embeds.append(embed)
+            embed = discord.Embed()
+            chars = 0
+
+        embed.add_field(name=name, value=value, inline=True)
+        chars += add
+
+    embeds.append(embed)
+    return embeds
 
 
 def register(client, tree: app_commands.CommandTree):
@@ -20,58 +74,32 @@ def register(client, tree: app_commands.CommandTree):
         name="warstats",
         description="Your won-hit war stats (ranked vs other + FF averages).",
     )
-    async def warstats(interaction: discord.Interaction):
-        await interaction.response.defer(thinking=True)
-
-        try:
-            if not is_verified_member(interaction):
-                await interaction.followup.send(
-                    "You must have the **Verified** role to use this command."
-                )
-                return
-
-            if not isinstance(interaction.user, discord.Member):
-                await interaction.followup.send(
-                    "This command must be used in the server."
-                )
-                return
-
-            torn_id = get_torn_id_from_member(interaction.user)
-            if not torn_id:
-                await interaction.followup.send(
-                    "I couldn't find your Torn ID in your nickname.\n"
-                    "YATA should set it like: `Name [123456]`."
-                )
-                return
-
-            data = await get_user_warstats(int(torn_id))
-
-            ranked_ff_txt = _fmt_ff(data.get("ranked_ff_avg"))
-            other_ff_txt = _fmt_ff(data.get("other_ff_avg"))
-            total_ff_txt = _fmt_ff(data.get("total_ff_avg"))
-
-            progress = (
-                "✅ backfill complete"
-                if int(data.get("is_initialized") or 0) == 1
-                else "⏳ still backfilling older pages, run command again"
-            )
-
-            await interaction.followup.send(
-                f"📊 **Your War Stats:**\n"
-                f"- ⚔️ Total RW Hits: **{int(data.get('ranked_wins') or 0):,}**\n"
-                f"- 🥊 Total Outside Hits: **{int(data.get('other_wins') or 0):,}**\n"
-                f"- 📈 RW FF avg: **{ranked_ff_txt}**\n"
-                f"- 📊 Outside FF avg: **{other_ff_txt}**\n"
-                f"- 📉 Total FF avg: **{total_ff_txt}**\n"
-                f"- War start: <t:{int(data.get('war_start') or 0)}:f>\n"
-                f"- Status: {progress}"
-            )
-
-        except Exception as e:
-            await interaction.followup.send(
-                f"⚠️ Could not calculate `/warstats`: {e}"
-            )
-            print("Error in /warstats:", repr(e))
+    @requires_verified_torn_id
+    async def warstats(interaction: discord.Interaction, torn_id: int):
+        data = await get_user_warstats(int(torn_id))
+
+        ranked_ff_txt = _fmt_ff(data.get("ranked_ff_avg"))
+        other_ff_txt = _fmt_ff(data.get("other_ff_avg"))
+        total_ff_txt = _fmt_ff(data.get("total_ff_avg"))
+
+        progress = (
+            "✅ backfill complete"
+            if int(data.get("is_initialized") or 0) == 1
+            else "⏳ still backfilling older pages, run command again"
+        )
+        if data.get("stale"):
+            progress += "\n- ⚠️ Torn API unavailable — showing last stored stats"
+
+        await interaction.followup.send(
+            f"📊 **Your War Stats:**\n"
+            f"- ⚔️ Total RW Hits: **{int(data.get('ranked_wins') or 0):,}**\n"
+            f"- 🥊 Total Outside Hits: **{int(data.get('other_wins') or 0):,}**\n"
+            f"- 📈 RW FF avg: **{ranked_ff_txt}**\n"
+            f"- 📊 Outside FF avg: **{other_ff_txt}**\n"
+            f"- 📉 Total FF avg: **{total_ff_txt}**\n"
+            f"- War start: <t:{int(data.get('war_start') or 0)}:f>\n"
+            f"- Status: {progress}"
+        )
 
     @tree.command(
         name="warstats_all",
@@ -81,13 +109,14 @@ def register(client, tree: app_commands.CommandTree):
         await interaction.response.defer(thinking=True)
 
         try:
-            if not is_verified_member(interaction):
+            verified, leadership = classify_member(interaction)
+            if not verified:
                 await interaction.followup.send(
                     "You must have the **Verified** role to use this command."
                 )
                 return
 
-            if not is_leadership_member(interaction):
+            if not leadership:
                 await interaction.followup.send(
                     "This command is **leadership-only**."
                 )
@@ -101,48 +130,46 @@ def register(client, tree: app_commands.CommandTree):
                 f"War start: <t:{int(data.get('war_start') or 0)}:f>\n"
                 f"{'✅ backfill complete' if int(data.get('is_initialized') or 0) == 1 else '⏳ still backfilling, run command again'}\n"
             )
+            if data.get("stale"):
+                header += "⚠️ Torn API unavailable — showing last stored stats\n"
 
             if not rows:
                 await interaction.followup.send(header + "\nNo stats collected yet.")
                 return
 
-            # --- aligned monospace table ---
-            NAME_W = 22
-
-            table_lines = []
-            table_lines.append(
-                f"{'#':>3}  {'Name':<{NAME_W}}  {'RW':>5}  {'OUT':>5}  {'FF-RW':>6}  {'FF-OUT':>6}  {'FF-TOT':>6}"
-            )
-            table_lines.append(
-                f"{'-'*3}  {'-'*NAME_W}  {'-'*5}  {'-'*5}  {'-'*6}  {'-'*6}  {'-'*6}"
+            # one inline field per member — a full faction fits in a
+            # handful of stacked embeds instead of several text chunks.
+            # Group embeds per message by COMBINED size: the 6000-char
+            # cap counts every embed in the message, so two near-full
+            # embeds can't share one send.
+            embeds = _build_embeds(rows)
+            channel_id = interaction.channel_id or 0
+            batch: list = []
+            batch_chars = 0
+            first = True
+            for embed in embeds:
+                size = len(embed)
+                if batch and (
+                    len(batch) >= _EMBEDS_PER_MESSAGE
+                    or batch_chars + size > _MESSAGE_CHAR_BUDGET
+                ):
+                    await pacer.acquire(channel_id)
+                    await interaction.followup.send(
+                        content=header if first else None, embeds=batch
+                    )
+                    first = False
+                    batch = []
+                    batch_chars = 0
+                batch.append(embed)
+                batch_chars += size
+
+            await pacer.acquire(channel_id)
+            await interaction.followup.send(
+                content=header if first else None, embeds=batch
             )
 
-            for i, r in enumerate(rows, start=1):
-                name = (r.get("name") or f"[{r.get('torn_id')}]").strip()
-                if len(name) > NAME_W:
-                    name = name[:NAME_W - 1] + "…"
-
-                rw = int(r.get("ranked_wins") or 0)
-                ow = int(r.get("other_wins") or 0)
-
-                ff_rw = _fmt_ff(r.get("ranked_ff_avg"))
-                ff_out = _fmt_ff(r.get("other_ff_avg"))
-                ff_tot = _fmt_ff(r.get("total_ff_avg"))
-
-                table_lines.append(
-                    f"{i:>3}  {name:<{NAME_W}}  {rw:>5}  {ow:>5}  {ff_rw:>6}  {ff_out:>6}  {ff_tot:>6}"
-                )
-
-            # chunk while preserving code blocks
-            chunks = chunk_lines("", table_lines, limit=1800)
-            for idx, chunk in enumerate(chunks):
-                if idx == 0:
-                    await interaction.followup.send(header + "\n```text\n" + chunk + "\n```")
-                else:
-                    await interaction.followup.send("```text\n" + chunk + "\n```")
-
         except Exception as e:
             await interaction.followup.send(
                 f"⚠️ Could not calculate `/warstats_all`: {e}"
             )
-            print("Error in /warstats_all:", repr(e))
+            logger.exception("/warstats_all failed")
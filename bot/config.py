@@ -13,7 +13,7 @@ TORN_BASE = "https://api.torn.com/v2"
 DB_PATH = "botdata.sqlite3"
 
 VERIFIED_ROLE_NAME = "Verified"
-LEADERSHIP_ROLES = {"Negan Saviors", "Lieutenant Saviors", "Soldier"}
+LEADERSHIP_ROLES = frozenset({"Negan Saviors", "Lieutenant Saviors", "Soldier"})
 
 SHEET_BOT_DATA_CSV_URL = "https://docs.google.com/spreadsheets/d/1N84XYb1HsphSefm6K_wNwNpUqbQ41WnAV2ZpfYdYjsA/export?format=csv&gid=1601570346"
 
@@ -24,8 +24,9 @@ ROSTER_ALERT_MIN_INTERVAL_SECONDS = 3600  # at most one alert per hour
 WAR_START_CACHE_TTL_SECONDS = 120
 USER_STATS_CACHE_TTL_SECONDS = 60
 
-# Ordered list (first one that’s available wins)
-EASY_TARGET_ATTACK_LINKS: list[str] = [
+# Ordered (first one that’s available wins); tuple of literals lives in
+# the code object's constants, so re-imports don't rebuild it
+EASY_TARGET_ATTACK_LINKS: tuple[str, ...] = (
     "https://www.torn.com/loader.php?sid=attack&user2ID=1690708",
     "https://www.torn.com/loader.php?sid=attack&user2ID=3517372",
     "https://www.torn.com/loader.php?sid=attack&user2ID=3677182",
@@ -46,13 +47,12 @@ EASY_TARGET_ATTACK_LINKS: list[str] = [
     "https://www.torn.com/loader.php?sid=attack&user2ID=3335007",
     "https://www.torn.com/loader.php?sid=attack&user2ID=2986400",
     "https://www.torn.com/loader.php?sid=attack&user2ID=3179561",
-
-]
+)
 
 # Which Torn "status.state" values should be considered NOT attackable
 # (You asked “out of hospital”; I’m including Jail/Federal as sensible defaults.
 # If you want ONLY hospital, remove the others.)
-DISALLOWED_TARGET_STATES = {"Hospital", "Jail", "Federal"}
+DISALLOWED_TARGET_STATES = frozenset({"Hospital", "Jail", "Federal"})
 
 if not DISCORD_TOKEN:
     raise RuntimeError("DISCORD_TOKEN missing in .env")
@@ -1,639 +1,801 @@
-import sqlite3
-import time
-from typing import Optional, Dict, Any, List
-from dataclasses import dataclass
-
-from cryptography.fernet import Fernet
-from .config import DB_PATH, BOT_MASTER_KEY
-
-fernet = Fernet(BOT_MASTER_KEY.encode("utf-8"))
-
-
-# -----------------------------
-# INIT / CONNECTION
-# -----------------------------
-
-def db_init() -> sqlite3.Connection:
-    con = sqlite3.connect(DB_PATH)
-
-    try:
-        con.execute("PRAGMA journal_mode=WAL;")
-    except Exception:
-        pass
-
-    cur = con.cursor()
-
-    # Encrypted user keys table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_keys (
-            discord_user_id INTEGER PRIMARY KEY,
-            api_key_enc BLOB NOT NULL,
-            created_at INTEGER NOT NULL,
-            updated_at INTEGER NOT NULL
-        )
-    """)
-
-    # Chain ping opt-in table
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS chain_ping_optin (
-            guild_id INTEGER NOT NULL,
-            user_id  INTEGER NOT NULL,
-            PRIMARY KEY (guild_id, user_id)
-        )
-    """)
-    con.commit()
-    return con
-
-def ensure_roster_tables(conn):
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS roster_hour (
-      guild_id INTEGER NOT NULL,
-      day TEXT NOT NULL,            -- YYYY-MM-DD (UTC)
-      start_hour INTEGER NOT NULL,  -- 0-23 (UTC)
-      slot INTEGER NOT NULL,        -- 1-3
-      name TEXT NOT NULL,
-
-      state TEXT NOT NULL DEFAULT 'pending',  -- pending|online|late|missed|unknown
-      first_seen_ts INTEGER,                  -- epoch seconds (UTC) when they first appeared online/idle
-      late_minutes INTEGER NOT NULL DEFAULT 0,
-
-      PRIMARY KEY (guild_id, day, start_hour, slot, name)
-    );
-    """)
-    cur.execute("CREATE INDEX IF NOT EXISTS idx_roster_hour_lookup ON roster_hour(guild_id, day, start_hour);")
-
-
-    # Global faction scan state (one cursor per war_start)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS war_scan_global (
-            war_start INTEGER PRIMARY KEY,
-
-            last_ts INTEGER NOT NULL DEFAULT 0,
-            last_attack_id INTEGER NOT NULL DEFAULT 0,
-
-            backfill_to INTEGER,
-            is_initialized INTEGER NOT NULL DEFAULT 0,
-
-            updated_at INTEGER NOT NULL
-        )
-    """)
-    # Per-war processed attack IDs (dedupe across runs/restarts)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS war_processed_attack (
-            war_start INTEGER NOT NULL,
-            attack_id INTEGER NOT NULL,
-            PRIMARY KEY (war_start, attack_id)
-        )
-    """)
-
-
-    # Per-user rolling aggregates (won-only)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS war_user_agg (
-            war_start INTEGER NOT NULL,
-            torn_id INTEGER NOT NULL,
-
-            ranked_wins INTEGER NOT NULL DEFAULT 0,
-            other_wins INTEGER NOT NULL DEFAULT 0,
-
-            ranked_ff_sum REAL NOT NULL DEFAULT 0,
-            ranked_ff_count INTEGER NOT NULL DEFAULT 0,
-
-            total_ff_sum REAL NOT NULL DEFAULT 0,
-            total_ff_count INTEGER NOT NULL DEFAULT 0,
-
-            updated_at INTEGER NOT NULL,
-            PRIMARY KEY (war_start, torn_id)
-        )
-    """)
-
-    # Outcome counts per user, per bucket (ranked/outside), per result string
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS war_user_outcome (
-            war_start INTEGER NOT NULL,
-            torn_id INTEGER NOT NULL,
-            bucket TEXT NOT NULL,      -- 'ranked' | 'outside'
-            outcome TEXT NOT NULL,     -- normalized result (lowercase)
-            count INTEGER NOT NULL DEFAULT 0,
-            updated_at INTEGER NOT NULL,
-            PRIMARY KEY (war_start, torn_id, bucket, outcome)
-        )
-    """)
-
-    # Per-user bucket totals + FF aggregates (for "counted hits")
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS war_user_bucket (
-            war_start INTEGER NOT NULL,
-            torn_id INTEGER NOT NULL,
-            bucket TEXT NOT NULL,      -- 'ranked' | 'outside'
-
-            hits_total INTEGER NOT NULL DEFAULT 0,
-
-            ff_sum REAL NOT NULL DEFAULT 0,
-            ff_count INTEGER NOT NULL DEFAULT 0,
-
-            respect_gain_sum REAL NOT NULL DEFAULT 0,
-            respect_loss_sum REAL NOT NULL DEFAULT 0,
-
-            updated_at INTEGER NOT NULL,
-            PRIMARY KEY (war_start, torn_id, bucket)
-        )
-    """)
-
-
-    conn.commit()
-
-
-# -----------------------------
-# ENCRYPTION HELPERS
-# -----------------------------
-
-def encrypt_key(api_key: str) -> bytes:
-    return fernet.encrypt(api_key.encode("utf-8"))
-
-
-def decrypt_key(enc: bytes) -> str:
-    return fernet.decrypt(enc).decode("utf-8")
-
-def roster_upsert_expected(conn, guild_id: int, day: str, start_hour: int, expected: list[tuple[int, str]]):
-    """
-    expected: list of (slot, name)
-    Inserts pending rows for this hour. Does not delete existing rows (keeps history).
-    """
-    cur = conn.cursor()
-    for slot, name in expected:
-        cur.execute("""
-        INSERT OR IGNORE INTO roster_hour(guild_id, day, start_hour, slot, name)
-        VALUES(?,?,?,?,?)
-        """, (guild_id, day, start_hour, slot, name))
-    conn.commit()
-
-def roster_mark_online(conn, guild_id: int, day: str, start_hour: int, slot: int, name: str, first_seen_ts: int, late_minutes: int):
-    cur = conn.cursor()
-    cur.execute("""
-    UPDATE roster_hour
-       SET state = CASE WHEN ? > 0 THEN 'late' ELSE 'online' END,
-           first_seen_ts = COALESCE(first_seen_ts, ?),
-           late_minutes = CASE WHEN late_minutes = 0 THEN ? ELSE late_minutes END
-     WHERE guild_id=? AND day=? AND start_hour=? AND slot=? AND name=?
-       AND state IN ('pending','unknown')
-    """, (late_minutes, first_seen_ts, late_minutes, guild_id, day, start_hour, slot, name))
-    conn.commit()
-
-def roster_mark_missed(conn, guild_id: int, day: str, start_hour: int):
-    cur = conn.cursor()
-    cur.execute("""
-    UPDATE roster_hour
-       SET state = 'missed'
-     WHERE guild_id=? AND day=? AND start_hour=?
-       AND state = 'pending'
-    """, (guild_id, day, start_hour))
-    conn.commit()
-
-def roster_mark_unknown(conn, guild_id: int, day: str, start_hour: int, slot: int, name: str):
-    cur = conn.cursor()
-    cur.execute("""
-    UPDATE roster_hour
-       SET state = 'unknown'
-     WHERE guild_id=? AND day=? AND start_hour=? AND slot=? AND name=?
-       AND state = 'pending'
-    """, (guild_id, day, start_hour, slot, name))
-    conn.commit()
-
-def roster_get_hour(conn, guild_id: int, day: str, start_hour: int):
-    cur = conn.cursor()
-    cur.execute("""
-    SELECT slot, name, state, late_minutes, first_seen_ts
-      FROM roster_hour
-     WHERE guild_id=? AND day=? AND start_hour=?
-     ORDER BY slot ASC, name COLLATE NOCASE ASC
-    """, (guild_id, day, start_hour))
-    rows = cur.fetchall()
-    return [
-        {"slot": r[0], "name": r[1], "state": r[2], "late_minutes": r[3], "first_seen_ts": r[4]}
-        for r in rows
-    ]
-
-def roster_report(conn, guild_id: int, day_from: str | None = None, day_to: str | None = None):
-    """
-    Returns per-name totals: missed_count, late_count, total_late_minutes
-    Optional day range.
-    """
-    params = [guild_id]
-    where = "WHERE guild_id=?"
-    if day_from:
-        where += " AND day >= ?"
-        params.append(day_from)
-    if day_to:
-        where += " AND day <= ?"
-        params.append(day_to)
-
-    cur = conn.cursor()
-    cur.execute(f"""
-    SELECT name,
-           SUM(CASE WHEN state='missed' THEN 1 ELSE 0 END) AS missed,
-           SUM(CASE WHEN state='late' THEN 1 ELSE 0 END)   AS late,
-           SUM(CASE WHEN state='late' THEN late_minutes ELSE 0 END) AS late_minutes
-      FROM roster_hour
-      {where}
-     GROUP BY name
-     HAVING missed > 0 OR late > 0
-     ORDER BY missed DESC, late_minutes DESC, late DESC, name COLLATE NOCASE ASC
-    """, params)
-    rows = cur.fetchall()
-    return [
-        {"name": r[0], "missed": int(r[1] or 0), "late": int(r[2] or 0), "late_minutes": int(r[3] or 0)}
-        for r in rows
-    ]
-
-def war_outcome_apply(con, war_start: int, torn_id: int, bucket: str, outcome: str) -> None:
-    now = int(time.time())
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO war_user_outcome (war_start, torn_id, bucket, outcome, count, updated_at)
-        VALUES (?, ?, ?, ?, 1, ?)
-        ON CONFLICT(war_start, torn_id, bucket, outcome) DO UPDATE SET
-            count = count + 1,
-            updated_at = excluded.updated_at
-    """, (int(war_start), int(torn_id), str(bucket), str(outcome), now))
-    con.commit()
-def war_outcome_get_user(con, war_start: int, torn_id: int) -> dict:
-    """
-    Returns { bucket: { outcome: count } } for a user.
-    """
-    cur = con.cursor()
-    cur.execute("""
-        SELECT bucket, outcome, count
-          FROM war_user_outcome
-         WHERE war_start=? AND torn_id=?
-    """, (int(war_start), int(torn_id)))
-
-    out: dict[str, dict[str, int]] = {}
-    for bucket, outcome, cnt in cur.fetchall():
-        b = str(bucket)
-        o = str(outcome)
-        c = int(cnt or 0)
-        out.setdefault(b, {})[o] = c
-    return out
-
-
-def war_outcome_list_all(con, war_start: int) -> list[dict]:
-    """
-    Returns rows: {torn_id, bucket, outcome, count}
-    """
-    cur = con.cursor()
-    cur.execute("""
-        SELECT torn_id, bucket, outcome, count
-          FROM war_user_outcome
-         WHERE war_start=?
-    """, (int(war_start),))
-
-    rows = []
-    for tid, bucket, outcome, cnt in cur.fetchall():
-        rows.append({
-            "torn_id": int(tid),
-            "bucket": str(bucket),
-            "outcome": str(outcome),
-            "count": int(cnt or 0),
-        })
-    return rows
-
-def war_processed_try_mark(con: sqlite3.Connection, war_start: int, attack_id: int) -> bool:
-    """
-    Returns True if this (war_start, attack_id) was newly inserted (not processed before).
-    Returns False if it already existed (already processed).
-    """
-    cur = con.cursor()
-    cur.execute(
-        "INSERT OR IGNORE INTO war_processed_attack (war_start, attack_id) VALUES (?, ?)",
-        (int(war_start), int(attack_id)),
-    )
-    return cur.rowcount == 1
-
-
-
-def war_bucket_apply(
-    con, war_start: int, torn_id: int, bucket: str,
-    ff_value: float | None,
-    respect_gain: float,
-    respect_loss: float
-) -> None:
-    now = int(time.time())
-    ff_sum_inc = float(ff_value) if ff_value is not None else 0.0
-    ff_count_inc = 1 if ff_value is not None else 0
-
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO war_user_bucket (
-            war_start, torn_id, bucket,
-            hits_total,
-            ff_sum, ff_count,
-            respect_gain_sum, respect_loss_sum,
-            updated_at
-        )
-        VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
-        ON CONFLICT(war_start, torn_id, bucket) DO UPDATE SET
-            hits_total = hits_total + 1,
-            ff_sum = ff_sum + excluded.ff_sum,
-            ff_count = ff_count + excluded.ff_count,
-            respect_gain_sum = respect_gain_sum + excluded.respect_gain_sum,
-            respect_loss_sum = respect_loss_sum + excluded.respect_loss_sum,
-            updated_at = excluded.updated_at
-    """, (
-        int(war_start), int(torn_id), str(bucket),
-        ff_sum_inc, ff_count_inc,
-        float(respect_gain), float(respect_loss),
-        now
-    ))
-    con.commit()
-
-
-def war_bucket_get(con, war_start: int, torn_id: int, bucket: str) -> dict:
-    cur = con.cursor()
-    cur.execute("""
-        SELECT hits_total, ff_sum, ff_count, respect_gain_sum, respect_loss_sum
-        FROM war_user_bucket
-        WHERE war_start=? AND torn_id=? AND bucket=?
-    """, (int(war_start), int(torn_id), str(bucket)))
-    row = cur.fetchone()
-    if not row:
-        return {"hits_total": 0, "ff_sum": 0.0, "ff_count": 0, "respect_gain_sum": 0.0, "respect_loss_sum": 0.0}
-    return {
-        "hits_total": int(row[0]),
-        "ff_sum": float(row[1]),
-        "ff_count": int(row[2]),
-        "respect_gain_sum": float(row[3]),
-        "respect_loss_sum": float(row[4]),
-    }
-
-
-def war_bucket_list_all(con, war_start: int) -> list[dict]:
-    cur = con.cursor()
-    cur.execute("""
-        SELECT torn_id, bucket, hits_total, ff_sum, ff_count, respect_gain_sum, respect_loss_sum
-        FROM war_user_bucket
-        WHERE war_start=?
-    """, (int(war_start),))
-    out = []
-    for r in cur.fetchall():
-        out.append({
-            "torn_id": int(r[0]),
-            "bucket": str(r[1]),
-            "hits_total": int(r[2]),
-            "ff_sum": float(r[3]),
-            "ff_count": int(r[4]),
-            "respect_gain_sum": float(r[5]),
-            "respect_loss_sum": float(r[6]),
-        })
-    return out
-
-
-
-# -----------------------------
-# USER API KEY STORAGE
-# -----------------------------
-
-def upsert_user_key(con: sqlite3.Connection, discord_user_id: int, api_key_plain: str) -> None:
-    enc = encrypt_key(api_key_plain)
-    now = int(time.time())
-
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO user_keys (discord_user_id, api_key_enc, created_at, updated_at)
-        VALUES (?, ?, ?, ?)
-        ON CONFLICT(discord_user_id) DO UPDATE SET
-            api_key_enc=excluded.api_key_enc,
-            updated_at=excluded.updated_at
-    """, (int(discord_user_id), enc, now, now))
-    con.commit()
-
-
-def get_user_key(con: sqlite3.Connection, discord_user_id: int) -> Optional[str]:
-    cur = con.cursor()
-    cur.execute("SELECT api_key_enc FROM user_keys WHERE discord_user_id=?", (int(discord_user_id),))
-    row = cur.fetchone()
-    if not row:
-        return None
-    return decrypt_key(row[0])
-
-
-def delete_user_key(con: sqlite3.Connection, discord_user_id: int) -> bool:
-    cur = con.cursor()
-    cur.execute("DELETE FROM user_keys WHERE discord_user_id=?", (int(discord_user_id),))
-    con.commit()
-    return cur.rowcount > 0
-
-
-# -----------------------------
-# CHAIN PING OPT-IN
-# -----------------------------
-
-def chain_optin_add(con: sqlite3.Connection, guild_id: int, user_id: int) -> None:
-    cur = con.cursor()
-    cur.execute(
-        "INSERT OR IGNORE INTO chain_ping_optin (guild_id, user_id) VALUES (?, ?)",
-        (int(guild_id), int(user_id)),
-    )
-    con.commit()
-
-
-def chain_optin_remove(con: sqlite3.Connection, guild_id: int, user_id: int) -> None:
-    cur = con.cursor()
-    cur.execute(
-        "DELETE FROM chain_ping_optin WHERE guild_id = ? AND user_id = ?",
-        (int(guild_id), int(user_id)),
-    )
-    con.commit()
-
-
-def chain_optin_clear_guild(con: sqlite3.Connection, guild_id: int) -> int:
-    cur = con.cursor()
-    cur.execute("DELETE FROM chain_ping_optin WHERE guild_id = ?", (int(guild_id),))
-    con.commit()
-    return int(cur.rowcount or 0)
-
-
-def chain_optin_list(con: sqlite3.Connection, guild_id: int) -> list[int]:
-    cur = con.cursor()
-    cur.execute(
-        "SELECT user_id FROM chain_ping_optin WHERE guild_id = ?",
-        (int(guild_id),),
-    )
-    return [int(row[0]) for row in cur.fetchall()]
-
-
-# -----------------------------
-# WAR SCAN GLOBAL + AGGREGATES
-# -----------------------------
-
-@dataclass
-class WarScanGlobalState:
-    war_start: int
-    last_ts: int
-    last_attack_id: int
-    backfill_to: Optional[int]
-    is_initialized: int
-    updated_at: int
-
-
-def war_global_get(con: sqlite3.Connection, war_start: int) -> Optional[WarScanGlobalState]:
-    cur = con.cursor()
-    cur.execute("""
-        SELECT war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at
-        FROM war_scan_global
-        WHERE war_start = ?
-    """, (int(war_start),))
-    row = cur.fetchone()
-    if not row:
-        return None
-    return WarScanGlobalState(
-        war_start=int(row[0]),
-        last_ts=int(row[1]),
-        last_attack_id=int(row[2]),
-        backfill_to=(int(row[3]) if row[3] is not None else None),
-        is_initialized=int(row[4]),
-        updated_at=int(row[5]),
-    )
-
-
-def war_global_reset(con: sqlite3.Connection, war_start: int) -> WarScanGlobalState:
-    now = int(time.time())
-    st = WarScanGlobalState(
-        war_start=int(war_start),
-        last_ts=int(war_start),          # start cursor at war start
-        last_attack_id=0,
-        backfill_to=None,
-        is_initialized=0,
-        updated_at=now,
-    )
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO war_scan_global (war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(war_start) DO UPDATE SET
-            last_ts=excluded.last_ts,
-            last_attack_id=excluded.last_attack_id,
-            backfill_to=excluded.backfill_to,
-            is_initialized=excluded.is_initialized,
-            updated_at=excluded.updated_at
-    """, (st.war_start, st.last_ts, st.last_attack_id, st.backfill_to, st.is_initialized, st.updated_at))
-    con.commit()
-    return st
-
-
-def war_global_save(con: sqlite3.Connection, st: WarScanGlobalState) -> None:
-    st.updated_at = int(time.time())
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO war_scan_global (war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at)
-        VALUES (?, ?, ?, ?, ?, ?)
-        ON CONFLICT(war_start) DO UPDATE SET
-            last_ts=excluded.last_ts,
-            last_attack_id=excluded.last_attack_id,
-            backfill_to=excluded.backfill_to,
-            is_initialized=excluded.is_initialized,
-            updated_at=excluded.updated_at
-    """, (st.war_start, st.last_ts, st.last_attack_id, st.backfill_to, st.is_initialized, st.updated_at))
-    con.commit()
-
-
-def war_agg_apply(
-    con: sqlite3.Connection,
-    war_start: int,
-    torn_id: int,
-    is_ranked: bool,
-    ff_value: Optional[float],
-) -> None:
-    """
-    Apply ONE won hit into aggregates.
-    """
-    now = int(time.time())
-    ranked_inc = 1 if is_ranked else 0
-    other_inc = 0 if is_ranked else 1
-
-    total_ff_sum_inc = float(ff_value) if ff_value is not None else 0.0
-    total_ff_count_inc = 1 if ff_value is not None else 0
-
-    ranked_ff_sum_inc = float(ff_value) if (is_ranked and ff_value is not None) else 0.0
-    ranked_ff_count_inc = 1 if (is_ranked and ff_value is not None) else 0
-
-    cur = con.cursor()
-    cur.execute("""
-        INSERT INTO war_user_agg (
-            war_start, torn_id,
-            ranked_wins, other_wins,
-            ranked_ff_sum, ranked_ff_count,
-            total_ff_sum, total_ff_count,
-            updated_at
-        )
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(war_start, torn_id) DO UPDATE SET
-            ranked_wins = ranked_wins + excluded.ranked_wins,
-            other_wins  = other_wins  + excluded.other_wins,
-            ranked_ff_sum   = ranked_ff_sum   + excluded.ranked_ff_sum,
-            ranked_ff_count = ranked_ff_count + excluded.ranked_ff_count,
-            total_ff_sum    = total_ff_sum    + excluded.total_ff_sum,
-            total_ff_count  = total_ff_count  + excluded.total_ff_count,
-            updated_at = excluded.updated_at
-    """, (
-        int(war_start), int(torn_id),
-        ranked_inc, other_inc,
-        ranked_ff_sum_inc, ranked_ff_count_inc,
-        total_ff_sum_inc, total_ff_count_inc,
-        now
-    ))
-    con.commit()
-
-
-def war_agg_get(con: sqlite3.Connection, war_start: int, torn_id: int) -> Dict[str, Any]:
-    cur = con.cursor()
-    cur.execute("""
-        SELECT ranked_wins, other_wins,
-               ranked_ff_sum, ranked_ff_count,
-               total_ff_sum, total_ff_count
-        FROM war_user_agg
-        WHERE war_start = ? AND torn_id = ?
-    """, (int(war_start), int(torn_id)))
-    row = cur.fetchone()
-    if not row:
-        return {
-            "ranked_wins": 0,
-            "other_wins": 0,
-            "ranked_ff_sum": 0.0,
-            "ranked_ff_count": 0,
-            "total_ff_sum": 0.0,
-            "total_ff_count": 0,
-        }
-    return {
-        "ranked_wins": int(row[0]),
-        "other_wins": int(row[1]),
-        "ranked_ff_sum": float(row[2]),
-        "ranked_ff_count": int(row[3]),
-        "total_ff_sum": float(row[4]),
-        "total_ff_count": int(row[5]),
-    }
-
-
-def war_agg_list_all(con: sqlite3.Connection, war_start: int) -> List[Dict[str, Any]]:
-    cur = con.cursor()
-    cur.execute("""
-        SELECT torn_id, ranked_wins, other_wins,
-               ranked_ff_sum, ranked_ff_count,
-               total_ff_sum, total_ff_count
-        FROM war_user_agg
-        WHERE war_start = ?
-        ORDER BY ranked_wins DESC, other_wins DESC, torn_id ASC
-    """, (int(war_start),))
-    out: List[Dict[str, Any]] = []
-    for row in cur.fetchall():
-        out.append({
-            "torn_id": int(row[0]),
-            "ranked_wins": int(row[1]),
-            "other_wins": int(row[2]),
-            "ranked_ff_sum": float(row[3]),
-            "ranked_ff_count": int(row[4]),
-            "total_ff_sum": float(row[5]),
-            "total_ff_count": int(row[6]),
-        })
-    return out
+import functools
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from dataclasses import dataclass
+
+from cryptography.fernet import Fernet
+from .config import DB_PATH, BOT_MASTER_KEY
+
+
+@functools.lru_cache(maxsize=32)
+def _get_fernet(key_b64: str) -> Fernet:
+    # Derive-once: Fernet's constructor base64-decodes and splits the
+    # key; memoising keeps that a one-time cost per key even if
+    # per-guild keys show up later.
+    return Fernet(key_b64.encode("utf-8"))
+
+
+fernet = _get_fernet(BOT_MASTER_KEY)
+
+
+# -----------------------------
+# INIT / CONNECTION
+# -----------------------------
+
+def db_init() -> sqlite3.Connection:
+    # check_same_thread=False: async handlers run queries via asyncio.to_thread,
+    # so the connection is touched from worker threads (one query at a time).
+    con = sqlite3.connect(DB_PATH, check_same_thread=False)
+
+    try:
+        con.execute("PRAGMA journal_mode=WAL;")
+    except Exception:
+        pass
+
+    # WAL makes NORMAL durability safe (a crash loses at most the last
+    # commit, never corrupts); busy_timeout replaces "database is locked"
+    # errors with short waits; the rest keep temp sorts and hot pages in
+    # memory instead of on disk.
+    try:
+        con.execute("PRAGMA synchronous=NORMAL;")
+        con.execute("PRAGMA busy_timeout=5000;")
+        con.execute("PRAGMA temp_store=MEMORY;")
+        con.execute("PRAGMA cache_size=-20000;")   # ~20 MB page cache
+        con.execute("PRAGMA mmap_size=268435456;")  # 256 MB, best-effort
+    except Exception:
+        pass
+
+    # One transaction for the whole base schema
+    with con:
+        # Encrypted user keys table
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS user_keys (
+                discord_user_id INTEGER PRIMARY KEY,
+                api_key_enc BLOB NOT NULL,
+                created_at INTEGER NOT NULL,
+                updated_at INTEGER NOT NULL
+            )
+        """)
+
+        # Chain ping opt-in table
+        con.execute("""
+            CREATE TABLE IF NOT EXISTS chain_ping_optin (
+                guild_id INTEGER NOT NULL,
+                user_id  INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, user_id)
+            )
+        """)
+    return con
+
+def db_open_readonly() -> Optional[sqlite3.Connection]:
+    """
+    Open a second, read-only connection for SELECT-heavy paths.
+
+    Under WAL, readers on their OWN connection never queue behind the
+    writer; through the single shared connection sqlite3 serialises
+    everything. Returns None if the database file can't be opened
+    read-only (callers fall back to the writer connection).
+    """
+    try:
+        ro = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True, check_same_thread=False)
+        ro.execute("PRAGMA query_only=1;")
+        ro.execute("PRAGMA busy_timeout=5000;")
+        ro.execute("PRAGMA cache_size=-20000;")
+        return ro
+    except Exception:
+        return None
+
+
+def ensure_roster_tables(conn):
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS roster_hour (
+      guild_id INTEGER NOT NULL,
+      day TEXT NOT NULL,            -- YYYY-MM-DD (UTC)
+      start_hour INTEGER NOT NULL,  -- 0-23 (UTC)
+      slot INTEGER NOT NULL,        -- 1-3
+      name TEXT NOT NULL,
+
+      state TEXT NOT NULL DEFAULT 'pending',  -- pending|online|late|missed|unknown
+      first_seen_ts INTEGER,                  -- epoch seconds (UTC) when they first appeared online/idle
+      late_minutes INTEGER NOT NULL DEFAULT 0,
+
+      PRIMARY KEY (guild_id, day, start_hour, slot, name)
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_roster_hour_lookup ON roster_hour(guild_id, day, start_hour);")
+    # roster_report groups by name over an optional day range — this lets
+    # the GROUP BY stream in index order instead of scanning + sorting
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_roster_hour_name ON roster_hour(guild_id, name, day);")
+
+
+    # Global faction scan state (one cursor per war_start)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS war_scan_global (
+            war_start INTEGER PRIMARY KEY,
+
+            last_ts INTEGER NOT NULL DEFAULT 0,
+            last_attack_id INTEGER NOT NULL DEFAULT 0,
+
+            backfill_to INTEGER,
+            is_initialized INTEGER NOT NULL DEFAULT 0,
+
+            updated_at INTEGER NOT NULL
+        )
+    """)
+    # Per-war processed attack IDs (dedupe across runs/restarts)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS war_processed_attack (
+            war_start INTEGER NOT NULL,
+            attack_id INTEGER NOT NULL,
+            PRIMARY KEY (war_start, attack_id)
+        )
+    """)
+
+
+    # Per-user rolling aggregates (won-only)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS war_user_agg (
+            war_start INTEGER NOT NULL,
+            torn_id INTEGER NOT NULL,
+
+            ranked_wins INTEGER NOT NULL DEFAULT 0,
+            other_wins INTEGER NOT NULL DEFAULT 0,
+
+            ranked_ff_sum REAL NOT NULL DEFAULT 0,
+            ranked_ff_count INTEGER NOT NULL DEFAULT 0,
+
+            total_ff_sum REAL NOT NULL DEFAULT 0,
+            total_ff_count INTEGER NOT NULL DEFAULT 0,
+
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (war_start, torn_id)
+        )
+    """)
+    # Matches war_agg_list_all's ORDER BY so the leaderboard walks the
+    # index instead of building a temp b-tree per call
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_war_agg_rank
+        ON war_user_agg(war_start, ranked_wins DESC, other_wins DESC, torn_id ASC)
+    """)
+
+    # Outcome counts per user, per bucket (ranked/outside), per result string
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS war_user_outcome (
+            war_start INTEGER NOT NULL,
+            torn_id INTEGER NOT NULL,
+            bucket TEXT NOT NULL,      -- 'ranked' | 'outside'
+            outcome TEXT NOT NULL,     -- normalized result (lowercase)
+            count INTEGER NOT NULL DEFAULT 0,
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (war_start, torn_id, bucket, outcome)
+        )
+    """)
+
+    # Per-user bucket totals + FF aggregates (for "counted hits")
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS war_user_bucket (
+            war_start INTEGER NOT NULL,
+            torn_id INTEGER NOT NULL,
+            bucket TEXT NOT NULL,      -- 'ranked' | 'outside'
+
+            hits_total INTEGER NOT NULL DEFAULT 0,
+
+            ff_sum REAL NOT NULL DEFAULT 0,
+            ff_count INTEGER NOT NULL DEFAULT 0,
+
+            respect_gain_sum REAL NOT NULL DEFAULT 0,
+            respect_loss_sum REAL NOT NULL DEFAULT 0,
+
+            updated_at INTEGER NOT NULL,
+            PRIMARY KEY (war_start, torn_id, bucket)
+        )
+    """)
+
+
+    conn.commit()
+
+
+# -----------------------------
+# ENCRYPTION HELPERS
+# -----------------------------
+
+def encrypt_key(api_key: str) -> bytes:
+    # Torn keys are 16 alphanumeric chars; the ascii codec skips the
+    # utf-8 decoder's multibyte machinery on this hot path
+    return fernet.encrypt(api_key.encode("ascii"))
+
+
+def decrypt_key(enc: bytes) -> str:
+    return fernet.decrypt(enc).decode("ascii")
+
+def roster_upsert_expected(conn, guild_id: int, day: str, start_hour: int, expected: list[tuple[int, str]]):
+    """
+    expected: list of (slot, name)
+    Inserts pending rows for this hour. Does not delete existing rows (keeps history).
+    """
+    with conn:
+        conn.executemany("""
+        INSERT OR IGNORE INTO roster_hour(guild_id, day, start_hour, slot, name)
+        VALUES(?,?,?,?,?)
+        """, [(guild_id, day, start_hour, slot, name) for slot, name in expected])
+
+def roster_mark_online(conn, guild_id: int, day: str, start_hour: int, slot: int, name: str, first_seen_ts: int, late_minutes: int):
+    state = "late" if late_minutes > 0 else "online"
+    with conn:
+        # Common case: untouched pending row — plain column sets, no
+        # CASE/COALESCE evaluation against the existing values
+        cur = conn.execute("""
+        UPDATE roster_hour
+           SET state=?, first_seen_ts=?, late_minutes=?
+         WHERE guild_id=? AND day=? AND start_hour=? AND slot=? AND name=?
+           AND state='pending' AND first_seen_ts IS NULL
+        """, (state, first_seen_ts, late_minutes, guild_id, day, start_hour, slot, name))
+        if cur.rowcount == 0:
+            # Re-visit (unknown state or partially-filled row) — keep the
+            # original keep-earliest semantics
+            conn.execute("""
+            UPDATE roster_hour
+               SET state = CASE WHEN ? > 0 THEN 'late' ELSE 'online' END,
+                   first_seen_ts = COALESCE(first_seen_ts, ?),
+                   late_minutes = CASE WHEN late_minutes = 0 THEN ? ELSE late_minutes END
+             WHERE guild_id=? AND day=? AND start_hour=? AND slot=? AND name=?
+               AND state IN ('pending','unknown')
+            """, (late_minutes, first_seen_ts, late_minutes, guild_id, day, start_hour, slot, name))
+
+def roster_mark_missed(conn, guild_id: int, day: str, start_hour: int):
+    with conn:
+        conn.execute("""
+        UPDATE roster_hour
+           SET state = 'missed'
+         WHERE guild_id=? AND day=? AND start_hour=?
+           AND state = 'pending'
+        """, (guild_id, day, start_hour))
+
+def roster_mark_missed_range(conn, guild_id: int, day: str, hour_from: int, hour_to: int):
+    # Sweep several stale hours (e.g. after downtime) in one statement
+    # instead of looping roster_mark_missed per hour
+    with conn:
+        conn.execute("""
+        UPDATE roster_hour
+           SET state = 'missed'
+         WHERE guild_id=? AND day=? AND start_hour BETWEEN ? AND ?
+           AND state = 'pending'
+        """, (guild_id, day, hour_from, hour_to))
+
+def roster_mark_unknown(conn, guild_id: int, day: str, start_hour: int, slot: int, name: str):
+    with conn:
+        conn.execute("""
+        UPDATE roster_hour
+           SET state = 'unknown'
+         WHERE guild_id=? AND day=? AND start_hour=? AND slot=? AND name=?
+           AND state = 'pending'
+        """, (guild_id, day, start_hour, slot, name))
+
+def roster_get_hour(conn, guild_id: int, day: str, start_hour: int):
+    cur = conn.cursor()
+    # Cursor-level row factory: the dicts are built inside the fetch
+    # loop instead of materialising tuples and re-walking them
+    cur.row_factory = lambda c, r: {
+        "slot": r[0], "name": r[1], "state": r[2], "late_minutes": r[3], "first_seen_ts": r[4]
+    }
+    cur.execute("""
+    SELECT slot, name, state, late_minutes, first_seen_ts
+      FROM roster_hour
+     WHERE guild_id=? AND day=? AND start_hour=?
+     ORDER BY slot ASC, name COLLATE NOCASE ASC
+    """, (guild_id, day, start_hour))
+    return cur.fetchall()
+
+def roster_report(conn, guild_id: int, day_from: str | None = None, day_to: str | None = None,
+                  limit: int = 60):
+    """
+    Returns per-name totals: missed_count, late_count, total_late_minutes
+    Optional day range. Capped in SQL so only the displayed rows cross
+    into Python.
+    """
+    params = [guild_id]
+    where = "WHERE guild_id=?"
+    if day_from:
+        where += " AND day >= ?"
+        params.append(day_from)
+    if day_to:
+        where += " AND day <= ?"
+        params.append(day_to)
+    params.append(int(limit))
+
+    cur = conn.cursor()
+    cur.row_factory = lambda c, r: {
+        "name": r[0], "missed": int(r[1] or 0), "late": int(r[2] or 0), "late_minutes": int(r[3] or 0)
+    }
+    cur.execute(f"""
+    SELECT name,
+           SUM(CASE WHEN state='missed' THEN 1 ELSE 0 END) AS missed,
+           SUM(CASE WHEN state='late' THEN 1 ELSE 0 END)   AS late,
+           SUM(CASE WHEN state='late' THEN late_minutes ELSE 0 END) AS late_minutes
+      FROM roster_hour
+      {where}
+     GROUP BY name
+     HAVING missed > 0 OR late > 0
+     ORDER BY missed DESC, late_minutes DESC, late DESC, name COLLATE NOCASE ASC
+     LIMIT ?
+    """, params)
+    return cur.fetchall()
+
+# Hot-path SQL hoisted to module constants: sqlite3's per-connection
+# statement cache matches on the SQL string, so passing the same object
+# every call skips re-preparing the statement.
+_SQL_OUTCOME_UPSERT = """
+    INSERT INTO war_user_outcome (war_start, torn_id, bucket, outcome, count, updated_at)
+    VALUES (?, ?, ?, ?, 1, ?)
+    ON CONFLICT(war_start, torn_id, bucket, outcome) DO UPDATE SET
+        count = count + 1,
+        updated_at = excluded.updated_at
+"""
+
+_SQL_BUCKET_UPSERT = """
+    INSERT INTO war_user_bucket (
+        war_start, torn_id, bucket,
+        hits_total,
+        ff_sum, ff_count,
+        respect_gain_sum, respect_loss_sum,
+        updated_at
+    )
+    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?)
+    ON CONFLICT(war_start, torn_id, bucket) DO UPDATE SET
+        hits_total = hits_total + 1,
+        ff_sum = ff_sum + excluded.ff_sum,
+        ff_count = ff_count + excluded.ff_count,
+        respect_gain_sum = respect_gain_sum + excluded.respect_gain_sum,
+        respect_loss_sum = respect_loss_sum + excluded.respect_loss_sum,
+        updated_at = excluded.updated_at
+"""
+
+_SQL_TRY_MARK = "INSERT OR IGNORE INTO war_processed_attack (war_start, attack_id) VALUES (?, ?)"
+
+_SQL_PROCESSED_CHECK = "SELECT 1 FROM war_processed_attack WHERE war_start=? AND attack_id=?"
+
+_SQL_WAR_GLOBAL_UPSERT = """
+    INSERT INTO war_scan_global (war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(war_start) DO UPDATE SET
+        last_ts=excluded.last_ts,
+        last_attack_id=excluded.last_attack_id,
+        backfill_to=excluded.backfill_to,
+        is_initialized=excluded.is_initialized,
+        updated_at=excluded.updated_at
+"""
+
+_SQL_USER_KEY_GET = "SELECT api_key_enc FROM user_keys WHERE discord_user_id=?"
+
+
+def war_outcome_apply(con, war_start: int, torn_id: int, bucket: str, outcome: str) -> None:
+    now = int(time.time())
+    with con:
+        con.execute(_SQL_OUTCOME_UPSERT, (war_start, torn_id, bucket, outcome, now))
+def war_outcome_get_user(con, war_start: int, torn_id: int) -> dict:
+    """
+    Returns { bucket: { outcome: count } } for a user.
+    """
+    cur = con.cursor()
+    cur.execute("""
+        SELECT bucket, outcome, count
+          FROM war_user_outcome
+         WHERE war_start=? AND torn_id=?
+    """, (war_start, torn_id))
+
+    # Column affinities already yield str/int — no per-row conversions
+    out: dict[str, dict[str, int]] = {}
+    for bucket, outcome, cnt in cur.fetchall():
+        out.setdefault(bucket, {})[outcome] = cnt
+    return out
+
+
+def war_outcome_list_all(con, war_start: int) -> list[dict]:
+    """
+    Returns rows: {torn_id, bucket, outcome, count}
+    """
+    cur = con.cursor()
+    cur.execute("""
+        SELECT torn_id, bucket, outcome, count
+          FROM war_user_outcome
+         WHERE war_start=?
+    """, (war_start,))
+
+    rows = []
+    for tid, bucket, outcome, cnt in cur.fetchall():
+        rows.append({
+            "torn_id": tid,
+            "bucket": bucket,
+            "outcome": outcome,
+            "count": cnt,
+        })
+    return rows
+
+def war_processed_check(con: sqlite3.Connection, war_start: int, attack_id: int) -> bool:
+    """
+    Returns True if this (war_start, attack_id) was already processed.
+
+    Read-only on purpose: the mark itself is written by
+    war_apply_hits_batch in the same transaction as the aggregates, so a
+    failed scan pass never leaves an attack marked but uncounted.
+    """
+    return next(con.execute(_SQL_PROCESSED_CHECK, (war_start, attack_id)), None) is not None
+
+
+
+def war_bucket_apply(
+    con, war_start: int, torn_id: int, bucket: str,
+    ff_value: float | None,
+    respect_gain: float,
+    respect_loss: float
+) -> None:
+    now = int(time.time())
+    ff_sum_inc = float(ff_value) if ff_value is not None else 0.0
+    ff_count_inc = 1 if ff_value is not None else 0
+
+    with con:
+        con.execute(_SQL_BUCKET_UPSERT, (
+            war_start, torn_id, bucket,
+            ff_sum_inc, ff_count_inc,
+            respect_gain, respect_loss,
+            now
+        ))
+
+
+def war_apply_hits_batch(
+    con: sqlite3.Connection,
+    war_start: int,
+    outcome_rows: list[tuple[int, str, str]],
+    bucket_rows: list[tuple[int, str, Optional[float], float, float]],
+    mark_rows: list[int],
+) -> None:
+    """
+    Flush one scan pass worth of hits in a single transaction.
+
+    outcome_rows: (torn_id, bucket, outcome) — one per processed attack.
+    bucket_rows:  (torn_id, bucket, ff_value, respect_gain, respect_loss)
+                  — one per counted attack.
+    mark_rows:    attack ids to mark processed.
+
+    One commit for the whole batch instead of one per hit. The processed
+    marks land in the same transaction as the aggregates they belong to:
+    an attack is either fully counted and marked, or neither — a scan
+    pass that dies mid-way leaves nothing half-applied for the next
+    unrelated commit to pick up.
+    """
+    now = int(time.time())
+    ws = int(war_start)
+    cur = con.cursor()
+
+    if mark_rows:
+        cur.executemany(_SQL_TRY_MARK, [(ws, aid) for aid in mark_rows])
+
+    # Rows arrive already typed from the scan loop; `now` is computed
+    # once per flush and bools bind as 0/1, so the comprehensions emit
+    # parameter tuples with no per-row conversion calls.
+    if outcome_rows:
+        cur.executemany(_SQL_OUTCOME_UPSERT,
+                        [(ws, tid, b, o, now) for tid, b, o in outcome_rows])
+
+    if bucket_rows:
+        cur.executemany(_SQL_BUCKET_UPSERT, [
+            (ws, tid, b, ff if ff is not None else 0.0, ff is not None, rg, rl, now)
+            for tid, b, ff, rg, rl in bucket_rows
+        ])
+
+    con.commit()
+
+
+def war_bucket_get(con, war_start: int, torn_id: int, bucket: str) -> dict:
+    # next(cur, None) pulls the single row straight off the statement
+    # iterator — no intermediate cursor variable or fetchone call
+    row = next(con.execute("""
+        SELECT hits_total, ff_sum, ff_count, respect_gain_sum, respect_loss_sum
+        FROM war_user_bucket
+        WHERE war_start=? AND torn_id=? AND bucket=?
+    """, (war_start, torn_id, bucket)), None)
+    if not row:
+        return {"hits_total": 0, "ff_sum": 0.0, "ff_count": 0, "respect_gain_sum": 0.0, "respect_loss_sum": 0.0}
+    return {
+        "hits_total": row[0],
+        "ff_sum": row[1],
+        "ff_count": row[2],
+        "respect_gain_sum": row[3],
+        "respect_loss_sum": row[4],
+    }
+
+
+def war_bucket_list_all(con, war_start: int) -> list[dict]:
+    cur = con.cursor()
+    cur.execute("""
+        SELECT torn_id, bucket, hits_total, ff_sum, ff_count, respect_gain_sum, respect_loss_sum
+        FROM war_user_bucket
+        WHERE war_start=?
+    """, (war_start,))
+    out = []
+    for r in cur.fetchall():
+        out.append({
+            "torn_id": r[0],
+            "bucket": r[1],
+            "hits_total": r[2],
+            "ff_sum": r[3],
+            "ff_count": r[4],
+            "respect_gain_sum": r[5],
+            "respect_loss_sum": r[6],
+        })
+    return out
+
+
+
+# -----------------------------
+# USER API KEY STORAGE
+# -----------------------------
+
+# Decrypted keys, LRU-bounded. The same users invoke commands over and
+# over, and each lookup otherwise costs a SELECT plus a full Fernet
+# decrypt. Locked because the connection is shared across to_thread
+# workers (check_same_thread=False).
+_KEY_CACHE_MAX = 256
+_key_cache: "OrderedDict[int, str]" = OrderedDict()
+_key_cache_lock = threading.Lock()
+
+
+def upsert_user_key(con: sqlite3.Connection, discord_user_id: int, api_key_plain: str) -> None:
+    enc = encrypt_key(api_key_plain)
+    now = int(time.time())
+
+    with con:
+        con.execute("""
+            INSERT INTO user_keys (discord_user_id, api_key_enc, created_at, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(discord_user_id) DO UPDATE SET
+                api_key_enc=excluded.api_key_enc,
+                updated_at=excluded.updated_at
+        """, (discord_user_id, enc, now, now))
+
+    with _key_cache_lock:
+        _key_cache[int(discord_user_id)] = api_key_plain
+        _key_cache.move_to_end(int(discord_user_id))
+        while len(_key_cache) > _KEY_CACHE_MAX:
+            _key_cache.popitem(last=False)
+
+
+def get_user_key(con: sqlite3.Connection, discord_user_id: int) -> Optional[str]:
+    uid = int(discord_user_id)
+
+    with _key_cache_lock:
+        cached = _key_cache.get(uid)
+        if cached is not None:
+            _key_cache.move_to_end(uid)
+            return cached
+
+    row = next(con.execute(_SQL_USER_KEY_GET, (uid,)), None)
+    if not row:
+        return None
+    key = decrypt_key(row[0])
+
+    with _key_cache_lock:
+        _key_cache[uid] = key
+        _key_cache.move_to_end(uid)
+        while len(_key_cache) > _KEY_CACHE_MAX:
+            _key_cache.popitem(last=False)
+    return key
+
+
+def delete_user_key(con: sqlite3.Connection, discord_user_id: int) -> bool:
+    with con:
+        cur = con.execute("DELETE FROM user_keys WHERE discord_user_id=?", (discord_user_id,))
+    with _key_cache_lock:
+        _key_cache.pop(int(discord_user_id), None)
+    return cur.rowcount > 0
+
+
+# -----------------------------
+# CHAIN PING OPT-IN
+# -----------------------------
+
+def chain_optin_add(con: sqlite3.Connection, guild_id: int, user_id: int) -> None:
+    with con:
+        con.execute(
+            "INSERT OR IGNORE INTO chain_ping_optin (guild_id, user_id) VALUES (?, ?)",
+            (guild_id, user_id),
+        )
+
+
+def chain_optin_remove(con: sqlite3.Connection, guild_id: int, user_id: int) -> None:
+    with con:
+        con.execute(
+            "DELETE FROM chain_ping_optin WHERE guild_id = ? AND user_id = ?",
+            (guild_id, user_id),
+        )
+
+
+def chain_optin_clear_guild(con: sqlite3.Connection, guild_id: int) -> int:
+    with con:
+        cur = con.execute("DELETE FROM chain_ping_optin WHERE guild_id = ?", (guild_id,))
+    return int(cur.rowcount or 0)
+
+
+def chain_optin_list(con: sqlite3.Connection, guild_id: int) -> frozenset[int]:
+    cur = con.cursor()
+    # user_id is an INTEGER column, so the values arrive as ints already
+    cur.row_factory = lambda c, r: r[0]
+    cur.execute(
+        "SELECT user_id FROM chain_ping_optin WHERE guild_id = ?",
+        (guild_id,),
+    )
+    return frozenset(cur)
+
+
+# -----------------------------
+# WAR SCAN GLOBAL + AGGREGATES
+# -----------------------------
+
+@dataclass
+class WarScanGlobalState:
+    war_start: int
+    last_ts: int
+    last_attack_id: int
+    backfill_to: Optional[int]
+    is_initialized: int
+    updated_at: int
+
+
+def war_global_get(con: sqlite3.Connection, war_start: int) -> Optional[WarScanGlobalState]:
+    row = next(con.execute("""
+        SELECT war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at
+        FROM war_scan_global
+        WHERE war_start = ?
+    """, (war_start,)), None)
+    if not row:
+        return None
+    return WarScanGlobalState(
+        war_start=row[0],
+        last_ts=row[1],
+        last_attack_id=row[2],
+        backfill_to=row[3],
+        is_initialized=row[4],
+        updated_at=row[5],
+    )
+
+
+# RETURNING needs SQLite 3.35+; older libs fall back to trusting the
+# values we just wrote.
+_SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_SQL_WAR_GLOBAL_UPSERT_RETURNING = _SQL_WAR_GLOBAL_UPSERT + """
+    RETURNING war_start, last_ts, last_attack_id, backfill_to, is_initialized, updated_at
+"""
+
+
+def war_global_reset(con: sqlite3.Connection, war_start: int) -> WarScanGlobalState:
+    now = int(time.time())
+    ws = int(war_start)
+    # Cursor starts at war start
+    params = (ws, ws, 0, None, 0, now)
+
+    if _SQLITE_HAS_RETURNING:
+        # Upsert + read back in one statement: the dataclass reflects
+        # what the database actually stored.
+        with con:
+            row = con.execute(_SQL_WAR_GLOBAL_UPSERT_RETURNING, params).fetchone()
+        return WarScanGlobalState(*row)
+
+    with con:
+        con.execute(_SQL_WAR_GLOBAL_UPSERT, params)
+    return WarScanGlobalState(
+        war_start=ws,
+        last_ts=ws,
+        last_attack_id=0,
+        backfill_to=None,
+        is_initialized=0,
+        updated_at=now,
+    )
+
+
+def war_global_save(con: sqlite3.Connection, st: WarScanGlobalState) -> None:
+    st.updated_at = int(time.time())
+    with con:
+        con.execute(_SQL_WAR_GLOBAL_UPSERT,
+                    (st.war_start, st.last_ts, st.last_attack_id, st.backfill_to, st.is_initialized, st.updated_at))
+
+
+def war_agg_apply(
+    con: sqlite3.Connection,
+    war_start: int,
+    torn_id: int,
+    is_ranked: bool,
+    ff_value: Optional[float],
+) -> None:
+    """
+    Apply ONE won hit into aggregates.
+    """
+    now = int(time.time())
+    ranked_inc = 1 if is_ranked else 0
+    other_inc = 0 if is_ranked else 1
+
+    total_ff_sum_inc = float(ff_value) if ff_value is not None else 0.0
+    total_ff_count_inc = 1 if ff_value is not None else 0
+
+    ranked_ff_sum_inc = float(ff_value) if (is_ranked and ff_value is not None) else 0.0
+    ranked_ff_count_inc = 1 if (is_ranked and ff_value is not None) else 0
+
+    with con:
+        con.execute("""
+            INSERT INTO war_user_agg (
+                war_start, torn_id,
+                ranked_wins, other_wins,
+                ranked_ff_sum, ranked_ff_count,
+                total_ff_sum, total_ff_count,
+                updated_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(war_start, torn_id) DO UPDATE SET
+                ranked_wins = ranked_wins + excluded.ranked_wins,
+                other_wins  = other_wins  + excluded.other_wins,
+                ranked_ff_sum   = ranked_ff_sum   + excluded.ranked_ff_sum,
+                ranked_ff_count = ranked_ff_count + excluded.ranked_ff_count,
+                total_ff_sum    = total_ff_sum    + excluded.total_ff_sum,
+                total_ff_count  = total_ff_count  + excluded.total_ff_count,
+                updated_at = excluded.updated_at
+        """, (
+            war_start, torn_id,
+            ranked_inc, other_inc,
+            ranked_ff_sum_inc, ranked_ff_count_inc,
+            total_ff_sum_inc, total_ff_count_inc,
+            now
+        ))
+
+
+def war_agg_get(con: sqlite3.Connection, war_start: int, torn_id: int) -> Dict[str, Any]:
+    row = next(con.execute("""
+        SELECT ranked_wins, other_wins,
+               ranked_ff_sum, ranked_ff_count,
+               total_ff_sum, total_ff_count
+        FROM war_user_agg
+        WHERE war_start = ? AND torn_id = ?
+    """, (war_start, torn_id)), None)
+    if not row:
+        return {
+            "ranked_wins": 0,
+            "other_wins": 0,
+            "ranked_ff_sum": 0.0,
+            "ranked_ff_count": 0,
+            "total_ff_sum": 0.0,
+            "total_ff_count": 0,
+        }
+    return {
+        "ranked_wins": row[0],
+        "other_wins": row[1],
+        "ranked_ff_sum": row[2],
+        "ranked_ff_count": row[3],
+        "total_ff_sum": row[4],
+        "total_ff_count": row[5],
+    }
+
+
+def war_agg_list_all(con: sqlite3.Connection, war_start: int) -> List[Dict[str, Any]]:
+    cur = con.cursor()
+    cur.row_factory = lambda c, r: {
+        "torn_id": r[0],
+        "ranked_wins": r[1],
+        "other_wins": r[2],
+        "ranked_ff_sum": r[3],
+        "ranked_ff_count": r[4],
+        "total_ff_sum": r[5],
+        "total_ff_count": r[6],
+    }
+    cur.execute("""
+        SELECT torn_id, ranked_wins, other_wins,
+               ranked_ff_sum, ranked_ff_count,
+               total_ff_sum, total_ff_count
+        FROM war_user_agg
+        WHERE war_start = ?
+        ORDER BY ranked_wins DESC, other_wins DESC, torn_id ASC
+    """, (war_start,))
+    return cur.fetchall()
@@ -0,0 +1,37 @@
+from typing import Optional
+
+import aiohttp
+
+
+# Process-wide aiohttp session, shared by every outbound API caller
+# (Torn, YATA, sheets). One session means one connection pool and one
+# DNS cache, so back-to-back requests reuse keep-alive connections
+# instead of paying a TCP+TLS handshake per call.
+_session: Optional[aiohttp.ClientSession] = None
+
+
+def get_session() -> aiohttp.ClientSession:
+    """
+    Return the shared ClientSession, creating it on first use.
+
+    Lazy creation keeps this import-safe: the session is only built from
+    inside a coroutine, once an event loop is running.
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit=32,
+                limit_per_host=8,
+                ttl_dns_cache=300,
+            ),
+        )
+    return _session
+
+
+async def close_session() -> None:
+    """Close the shared session on shutdown (no-op if never created)."""
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
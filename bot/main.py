@@ -1,18 +1,30 @@
+import logging
+
 import discord
 from discord import app_commands
 
 from .config import DISCORD_TOKEN
-from bot.db import db_init, ensure_roster_tables
+from bot.db import db_init, db_open_readonly, ensure_roster_tables
 from .commands import register_all
 from .chain_watcher import ChainWatcher
+from .http import close_session
 
+logger = logging.getLogger(__name__)
 
 
 intents = discord.Intents.default()
 intents.members = True
 intents.presences = True
 
-client = discord.Client(intents=intents)
+
+class BotClient(discord.Client):
+    async def close(self):
+        # Release the shared aiohttp session before the loop shuts down
+        await close_session()
+        await super().close()
+
+
+client = BotClient(intents=intents)
 tree = app_commands.CommandTree(client)
 
 
@@ -20,13 +32,18 @@ tree = app_commands.CommandTree(client)
 async def on_ready():
     try:
         await tree.sync()
-        print(f"Logged in as {client.user}")
-        print("Slash commands synced.")
-    except Exception as e:
-        print("Error in on_ready / command sync:", repr(e))
+        logger.info("Logged in as %s", client.user)
+        logger.info("Slash commands synced.")
+    except Exception:
+        logger.exception("on_ready / command sync failed")
 
 
 def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+
     conn = db_init()
     if conn is None:
         raise RuntimeError("db_init() returned None. Check DB path/config and permissions on the dev VPS.")
@@ -37,7 +54,9 @@ def main():
 
     from . import torn_api
     from bot.roster_monitor import RosterMonitor
-    torn_api.set_db_conn(client.db_conn)
+    # Second, read-only connection so stats reads never queue behind a
+    # scan commit (WAL: readers on their own connection don't block)
+    torn_api.set_db_conn(client.db_conn, db_open_readonly())
 
     client.chain_watcher = ChainWatcher(client, conn, poll_seconds=15)
 
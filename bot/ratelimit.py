@@ -0,0 +1,62 @@
+import asyncio
+import time
+from collections import deque
+from typing import List
+
+import discord
+
+
+class ChannelPacer:
+    """
+    Per-channel token bucket for message sends.
+
+    Allows at most `burst` sends per `window_seconds` per channel — defaults
+    stay safely under Discord's 5 msgs / 5s channel limit so alert storms and
+    long list outputs never trip a 429 or a mid-stream backoff stall inside
+    discord.py.
+    """
+
+    def __init__(self, burst: int = 4, window_seconds: float = 5.0):
+        self.burst = int(burst)
+        self.window_seconds = float(window_seconds)
+        self._sent_at: dict[int, deque] = {}
+
+    async def acquire(self, channel_id: int) -> None:
+        q = self._sent_at.setdefault(int(channel_id), deque())
+        while True:
+            now = time.monotonic()
+            while q and (now - q[0]) >= self.window_seconds:
+                q.popleft()
+            if len(q) < self.burst:
+                q.append(now)
+                return
+            await asyncio.sleep(self.window_seconds - (now - q[0]))
+
+
+# One bucket per channel for the whole process — commands and background
+# watchers sending into the same channel share the same budget.
+pacer = ChannelPacer()
+
+
+async def send_chunked(interaction: discord.Interaction, msgs: List[str]) -> None:
+    """
+    Send a list of followup messages through the shared per-channel bucket,
+    keeping throughput even instead of bursty-then-stalled.
+
+    The first message (usually the one carrying the header) is awaited on
+    its own; the rest go out concurrently so total wall time is ~one RTT
+    per bucket window instead of one RTT per message.
+    """
+    if not msgs:
+        return
+    channel_id = interaction.channel_id or 0
+
+    await pacer.acquire(channel_id)
+    await interaction.followup.send(msgs[0])
+
+    if len(msgs) > 1:
+        async def _send(m: str) -> None:
+            await pacer.acquire(channel_id)
+            await interaction.followup.send(m)
+
+        await asyncio.gather(*(_send(m) for m in msgs[1:]))
@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
@@ -10,6 +11,8 @@ import discord
 from bot import config, db, torn_api
 from bot.sheets_bot_data import fetch_bot_data_rows
 
+logger = logging.getLogger(__name__)
+
 
 def _utc_day_hour(ts: int | None = None) -> tuple[str, int]:
     now = datetime.fromtimestamp(ts or time.time(), tz=timezone.utc)
@@ -77,8 +80,20 @@ class RosterMonitor:
             try:
                 await self._tick()
             except Exception as e:
-                print("RosterMonitor tick error:", repr(e))
-            await asyncio.sleep(int(config.ROSTER_CHECK_INTERVAL_SECONDS))
+                logger.exception("RosterMonitor tick failed")
+            # Wait on the stop event instead of a plain sleep so stop()
+            # interrupts immediately, and cap the wait at the next hour
+            # boundary (+grace) so rollover work never lags a full interval
+            to_next_hour = 3600 - (int(time.time()) % 3600)
+            timeout = max(1, min(
+                int(config.ROSTER_CHECK_INTERVAL_SECONDS),
+                to_next_hour + int(config.ROSTER_GRACE_MINUTES) * 60,
+            ))
+            try:
+                await asyncio.wait_for(self._stop_evt.wait(), timeout=timeout)
+                break
+            except asyncio.TimeoutError:
+                pass
 
     async def _tick(self):
         # Only process guilds where chain watcher says it's running.
@@ -101,10 +116,18 @@ class RosterMonitor:
                 # write expected to DB
                 db.roster_upsert_expected(self.db_conn, guild.id, day, hour, expected)
 
-                # also mark last hour missed (pending -> missed) if any
-                # (only if we had a previous hour state)
+                # also mark elapsed hours missed (pending -> missed); a range
+                # sweep covers hours skipped while the bot was down, not just
+                # the immediately previous one
                 if hs:
-                    db.roster_mark_missed(self.db_conn, guild.id, hs.day, hs.hour)
+                    if hs.day == day:
+                        db.roster_mark_missed_range(
+                            self.db_conn, guild.id, hs.day, hs.hour, hour - 1
+                        )
+                    else:
+                        db.roster_mark_missed_range(
+                            self.db_conn, guild.id, hs.day, hs.hour, 23
+                        )
 
             # Evaluate current hour
             await self._evaluate_hour(guild, self._hour_state_by_guild[guild.id])
@@ -9,6 +9,7 @@ from typing import List
 import aiohttp
 
 from bot import config
+from bot.http import get_session
 
 
 @dataclass(frozen=True)
@@ -91,10 +92,9 @@ async def fetch_bot_data_rows() -> List[BotDataRow]:
       day=YYYY-MM-DD, start_hour=int(0..23), slot=int, name=str
     """
     url = config.SHEET_BOT_DATA_CSV_URL
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, timeout=aiohttp.ClientTimeout(total=20)) as resp:
-            resp.raise_for_status()
-            text = await resp.text()
+    async with get_session().get(url, timeout=aiohttp.ClientTimeout(total=20)) as resp:
+        resp.raise_for_status()
+        text = await resp.text()
 
     f = io.StringIO(text)
     reader = csv.DictReader(f)
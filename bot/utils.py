@@ -1,67 +1,230 @@
-import re
-from typing import Optional, List
-from urllib.parse import urlparse, parse_qs
-
-import discord
-from .config import VERIFIED_ROLE_NAME, LEADERSHIP_ROLES
-
-_TORN_ID_RE = re.compile(r"\[(\d{1,10})\]\s*$")
-
-
-def chunk_lines(header: str, lines: List[str], limit: int = 1900) -> List[str]:
-    messages: List[str] = []
-    current = header
-    for line in lines:
-        if len(current) + len(line) + 1 > limit:
-            messages.append(current.rstrip())
-            current = ""
-        current += line + "\n"
-    if current.strip():
-        messages.append(current.rstrip())
-    return messages
-
-
-def is_verified_member(interaction: discord.Interaction) -> bool:
-    member = interaction.user
-    if not isinstance(member, discord.Member):
-        return False
-    return any(role.name == VERIFIED_ROLE_NAME for role in member.roles)
-
-
-def is_leadership_member(interaction: discord.Interaction) -> bool:
-    member = interaction.user
-    if not isinstance(member, discord.Member):
-        return False
-    role_names = {r.name for r in member.roles}
-    return any(rn in role_names for rn in (LEADERSHIP_ROLES or set()))
-
-
-def revive_enabled(setting: str) -> bool:
-    if not setting:
-        return False
-    return setting.strip().lower() != "no one"
-
-
-def get_torn_id_from_member(member: discord.Member) -> Optional[int]:
-    text = member.display_name or ""
-    m = _TORN_ID_RE.search(text)
-    if not m:
-        return None
-    try:
-        tid = int(m.group(1))
-        return tid if tid > 0 else None
-    except ValueError:
-        return None
-
-
-def extract_to_from_prev_url(prev_url: Optional[str]) -> Optional[int]:
-    if not prev_url:
-        return None
-    try:
-        q = parse_qs(urlparse(prev_url).query)
-        val = q.get("to", [None])[0]
-        if val is None:
-            return None
-        return int(val)
-    except Exception:
-        return None
+import functools
+import logging
+import re
+import time
+from typing import Dict, Optional, List, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import discord
+from .config import VERIFIED_ROLE_NAME, LEADERSHIP_ROLES
+from .ratelimit import pacer
+
+logger = logging.getLogger(__name__)
+
+_TORN_ID_RE = re.compile(r"\[(\d{1,10})\]\s*$")
+
+
+def chunk_lines(header: str, lines: List[str], limit: int = 1900) -> List[str]:
+    messages: List[str] = []
+    current = header
+    for line in lines:
+        if len(current) + len(line) + 1 > limit:
+            messages.append(current.rstrip())
+            current = ""
+        current += line + "\n"
+    if current.strip():
+        messages.append(current.rstrip())
+    return messages
+
+
+_FIELD_CHAR_LIMIT = 1024   # per embed field
+_EMBED_CHAR_LIMIT = 5800   # total per embed (Discord allows 6000; keep headroom)
+_EMBED_FIELD_LIMIT = 25
+
+
+def embed_from_lines(title: str, lines: List[str]) -> List[discord.Embed]:
+    """
+    Greedily pack lines into embed fields (<=1024 chars each, <=25 fields,
+    <=~6000 chars per embed). One embed holds what used to take 4-5 plain
+    messages, so list commands cost a single HTTP request in the common case.
+    Returns a list of embeds; only the first carries the title.
+    """
+    embeds: List[discord.Embed] = []
+    embed = discord.Embed(title=title)
+    embed_chars = len(title)
+    field_buf: List[str] = []
+    field_chars = 0
+
+    def _flush_field():
+        nonlocal embed, embed_chars, field_buf, field_chars
+        if not field_buf:
+            return
+        if len(embed.fields) >= _EMBED_FIELD_LIMIT or embed_chars + field_chars > _EMBED_CHAR_LIMIT:
+            embeds.append(embed)
+            embed = discord.Embed()
+            embed_chars = 0
+        embed.add_field(name="\u200b", value="\n".join(field_buf), inline=False)
+        embed_chars += field_chars
+        field_buf = []
+        field_chars = 0
+
+    for line in lines:
+        if field_chars + len(line) + 1 > _FIELD_CHAR_LIMIT:
+            _flush_field()
+        field_buf.append(line)
+        field_chars += len(line) + 1
+
+    _flush_field()
+    if embed.fields or not embeds:
+        embeds.append(embed)
+    return embeds
+
+
+async def send_list(interaction: discord.Interaction, title: str, lines: List[str]) -> None:
+    """
+    Pack lines into embeds and send them through the shared channel bucket.
+
+    Single choke point for every list command — embed packing, pacing and
+    any future send optimisation happen here instead of at six call sites.
+    """
+    channel_id = interaction.channel_id or 0
+    for embed in embed_from_lines(title, lines):
+        await pacer.acquire(channel_id)
+        await interaction.followup.send(embed=embed)
+
+
+# Resolved role-id sets per guild so permission checks compare ints
+# instead of hashing role names; short TTL self-heals after role
+# renames without needing gateway hooks here.
+_ROLE_IDS_TTL_SECONDS = 300
+_role_ids_cache: Dict[int, Tuple[float, frozenset, frozenset]] = {}
+
+
+def _role_id_sets(guild: discord.Guild) -> Tuple[frozenset, frozenset]:
+    cached = _role_ids_cache.get(guild.id)
+    if cached is not None and (time.time() - cached[0]) <= _ROLE_IDS_TTL_SECONDS:
+        return cached[1], cached[2]
+    verified_ids = frozenset(r.id for r in guild.roles if r.name == VERIFIED_ROLE_NAME)
+    leadership_ids = frozenset(r.id for r in guild.roles if r.name in LEADERSHIP_ROLES)
+    _role_ids_cache[guild.id] = (time.time(), verified_ids, leadership_ids)
+    return verified_ids, leadership_ids
+
+
+def _member_role_ids(member: discord.Member):
+    # Raw snowflake list when available — member.roles allocates a fresh
+    # list of Role objects on every access
+    raw = getattr(member, "_roles", None)
+    if raw is not None:
+        return raw
+    return [r.id for r in member.roles]
+
+
+def is_verified_member(interaction: discord.Interaction) -> bool:
+    member = interaction.user
+    if not isinstance(member, discord.Member):
+        return False
+    verified_ids, _ = _role_id_sets(member.guild)
+    return any(rid in verified_ids for rid in _member_role_ids(member))
+
+
+def is_leadership_member(interaction: discord.Interaction) -> bool:
+    member = interaction.user
+    if not isinstance(member, discord.Member):
+        return False
+    _, leadership_ids = _role_id_sets(member.guild)
+    return any(rid in leadership_ids for rid in _member_role_ids(member))
+
+
+def classify_member(interaction: discord.Interaction) -> tuple:
+    """
+    Walk the member's roles once and answer both common permission
+    questions: returns (verified, leadership).
+    """
+    member = interaction.user
+    if not isinstance(member, discord.Member):
+        return (False, False)
+    verified_ids, leadership_ids = _role_id_sets(member.guild)
+    verified = False
+    leadership = False
+    for rid in _member_role_ids(member):
+        if rid in verified_ids:
+            verified = True
+        elif rid in leadership_ids:
+            leadership = True
+    return (verified, leadership)
+
+
+# Torn revive settings that mean "revives off" (case-folded once, checked with `in`)
+REVIVE_DISABLED_SETTINGS: frozenset = frozenset({"", "no one"})
+
+
+def revive_enabled(setting: str) -> bool:
+    if not setting:
+        return False
+    return setting.strip().lower() not in REVIVE_DISABLED_SETTINGS
+
+
+def requires_verified_torn_id(fn):
+    """
+    Shared defer -> Verified role -> Member -> Torn-id boilerplate for
+    commands that act on the caller's own Torn account. The wrapped handler
+    receives (interaction, torn_id) and runs inside the usual try/except.
+
+    NOTE: no functools.wraps here — inspect.signature() follows __wrapped__,
+    and discord.py would then expose torn_id as a slash-command option.
+    """
+    async def wrapper(interaction: discord.Interaction):
+        await interaction.response.defer(thinking=True)
+        try:
+            if not is_verified_member(interaction):
+                await interaction.followup.send(
+                    "You must have the **Verified** role to use this command."
+                )
+                return
+
+            if not isinstance(interaction.user, discord.Member):
+                await interaction.followup.send(
+                    "This command must be used in the server."
+                )
+                return
+
+            torn_id = get_torn_id_from_member(interaction.user)
+            if not torn_id:
+                await interaction.followup.send(
+                    "I couldn't find your Torn ID in your nickname.\n"
+                    "YATA should set it like: `Name [123456]`."
+                )
+                return
+
+            await fn(interaction, torn_id)
+
+        except Exception as e:
+            await interaction.followup.send(
+                f"⚠️ Could not calculate `/{fn.__name__}`: {e}"
+            )
+            logger.exception("/%s failed", fn.__name__)
+
+    wrapper.__name__ = fn.__name__
+    wrapper.__doc__ = fn.__doc__
+    return wrapper
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_torn_id(display_name: str) -> Optional[int]:
+    m = _TORN_ID_RE.search(display_name)
+    if not m:
+        return None
+    try:
+        tid = int(m.group(1))
+        return tid if tid > 0 else None
+    except ValueError:
+        return None
+
+
+def get_torn_id_from_member(member: discord.Member) -> Optional[int]:
+    # Parsing is pure per display name, so memoise on the string — the
+    # same members invoke commands over and over between nick changes
+    return _parse_torn_id(member.display_name or "")
+
+
+def extract_to_from_prev_url(prev_url: Optional[str]) -> Optional[int]:
+    if not prev_url:
+        return None
+    try:
+        q = parse_qs(urlparse(prev_url).query)
+        val = q.get("to", [None])[0]
+        if val is None:
+            return None
+        return int(val)
+    except Exception:
+        return None
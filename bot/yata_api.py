@@ -2,6 +2,9 @@ import time
 from typing import Any, Dict, Optional, Tuple, List
 
 import aiohttp
+import orjson
+
+from .http import get_session
 
 YATA_TRAVEL_EXPORT_URL = "https://yata.yt/api/v1/travel/export/"
 
@@ -22,10 +25,10 @@ async def yata_get_json(url: str, timeout_seconds: float = 15.0) -> dict:
     timeout_obj = aiohttp.ClientTimeout(total=float(timeout_seconds))
     headers = {"User-Agent": "discord-torn-bot"}
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers, timeout=timeout_obj) as resp:
-            # YATA returns JSON; allow unknown content type just in case
-            data = await resp.json(content_type=None)
+    async with get_session().get(url, headers=headers, timeout=timeout_obj) as resp:
+        # orjson on the raw body — the travel export is a large payload,
+        # and this also sidesteps YATA's occasional odd content-type
+        data = orjson.loads(await resp.read())
 
     if isinstance(data, dict) and "error" in data:
         # YATA error format documented in their API page
@@ -137,3 +140,52 @@ async def get_travel_export_cached(ttl_seconds: int = DEFAULT_YATA_CACHE_TTL_SEC
     _yata_export_cache["payload"] = norm
     _yata_export_cache["fetched_at"] = now
     return norm
+
+
+# -------------------------------------------------------------------
+# Derived search index over the export payload
+# -------------------------------------------------------------------
+# Rebuilt only when the cached payload object changes (~once per TTL),
+# so /market find does an O(1) id lookup or a flat pre-lowercased scan
+# instead of walking countries -> items and lowercasing every name on
+# every query.
+_travel_index: Tuple[
+    int,
+    Dict[int, List[Tuple[str, int, dict]]],
+    List[Tuple[str, int, dict, str]],
+    List[Tuple[int, str]],
+] = (0, {}, [], [])
+
+
+async def get_travel_index_cached(ttl_seconds: int = DEFAULT_YATA_CACHE_TTL_SECONDS) -> Tuple[
+    Dict[int, List[Tuple[str, int, dict]]],
+    List[Tuple[str, int, dict, str]],
+    List[Tuple[int, str]],
+]:
+    """
+    Returns (by_id, lowered, restocks_sorted) for the current cached payload:
+      by_id:           item id -> [(country_code, update_ts, item), ...]
+      lowered:         [(country_code, update_ts, item, name_lowercase), ...]
+      restocks_sorted: [(update_ts, country_code), ...] newest first
+    """
+    global _travel_index
+
+    payload = await get_travel_export_cached(ttl_seconds)
+    payload_id = id(payload)
+    if _travel_index[0] == payload_id:
+        return _travel_index[1], _travel_index[2], _travel_index[3]
+
+    by_id: Dict[int, List[Tuple[str, int, dict]]] = {}
+    lowered: List[Tuple[str, int, dict, str]] = []
+    restocks_sorted: List[Tuple[int, str]] = []
+    for code, block in (payload.get("stocks") or {}).items():
+        upd = _safe_int((block or {}).get("update"), 0)
+        restocks_sorted.append((upd, code))
+        for it in (block or {}).get("stocks") or []:
+            entry = (code, upd, it)
+            by_id.setdefault(it["id"], []).append(entry)
+            lowered.append((code, upd, it, it["name"].lower()))
+    restocks_sorted.sort(reverse=True)
+
+    _travel_index = (payload_id, by_id, lowered, restocks_sorted)
+    return by_id, lowered, restocks_sorted